@@ -1,15 +1,29 @@
 from .main_window import MainWindow
 from .camera_control import CameraControl
+from .camera_backend import CameraBackend, IdsPeakBackend
+from .simulated_camera import SimulatedBackend
+from .replay_source import ReplayBackend
 from .image_processor import ImageProcessor
 from .image_display import Display
-from .data_analyzer import DataAnalyzer
+from .data_analyzer import DataAnalyzer, PhaseAnalyzer, load_speed_traces
+from .spot_data import SpotRecorder, load_spot_data
+from .frame_stack import FrameStack
 from . import utils
 
 __all__ = [
     "MainWindow", 
     "CameraControl", 
+    "CameraBackend",
+    "IdsPeakBackend",
+    "SimulatedBackend",
+    "ReplayBackend",
     "ImageProcessor", 
     "Display", 
     "DataAnalyzer", 
+    "PhaseAnalyzer",
+    "load_speed_traces",
+    "SpotRecorder",
+    "load_spot_data",
+    "FrameStack",
     "utils"
 ]
@@ -0,0 +1,126 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from PySide6.QtCore import QThread, Signal
+from polar_cam.spot_data import convert_sample_folder, load_spot_data
+
+def default_worker_count():
+    return max(1, (os.cpu_count() or 1) - 2)
+
+def spot_directories(folder):
+    directories = []
+    for file in sorted(os.listdir(folder)):
+        path = os.path.join(folder, file)
+        if (
+            file.startswith('spot_') and file.endswith('_data') and
+            os.path.isdir(path)
+        ):
+            directories.append((int(file.split('_')[1]), path))
+    return directories
+
+def analyze_spot_directory(data_analyzer, spot_id, directory, folder):
+    start_time = time.perf_counter()
+    columns, metadata = load_spot_data(directory)
+    timestamps = columns['timestamps']
+    traces = data_analyzer.analyze(
+        columns, timestamps, spot_id, folder,
+        visits=metadata.get('visits'))
+
+    summary = {
+        'spot_id': spot_id,
+        'samples': len(timestamps),
+        'duration': (
+            float(timestamps[-1] - timestamps[0]) if len(timestamps) else 0.0),
+        'dropped_frames': metadata.get('dropped_frames', 0),
+        'frame_gaps': metadata.get('frame_gaps', 0),
+        'elapsed': time.perf_counter() - start_time,
+    }
+    for label, trace in traces.items():
+        summary[label] = {
+            'windows': len(trace['frequency']),
+            'median_frequency': (
+                float(np.median(trace['frequency']))
+                if len(trace['frequency']) else None),
+        }
+    return summary
+
+def plot_spot_traces(data_analyzer, folder, spot_ids):
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    return data_analyzer.plot_sample_folder(folder, spot_ids)
+
+class AnalysisRunner(QThread):
+    progress = Signal(int, int, str)
+    completed = Signal(dict)
+
+    def __init__(self, data_analyzer, folder, workers=None, plot=True):
+        super().__init__()
+        self.data_analyzer = data_analyzer
+        self.folder = folder
+        self.workers = workers or default_worker_count()
+        self.plot = plot
+
+    def run(self):
+        start_time = time.perf_counter()
+        convert_sample_folder(self.folder)
+        directories = spot_directories(self.folder)
+        total = len(directories)
+        spots = []
+        errors = []
+        plotted = []
+
+        self.progress.emit(0, total, "")
+        workers = max(1, min(self.workers, total or 1))
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+                max_workers=workers, mp_context=context) as executor:
+            futures = {
+                executor.submit(
+                    analyze_spot_directory, self.data_analyzer, spot_id,
+                    directory, self.folder): spot_id
+                for spot_id, directory in directories
+            }
+            for future in as_completed(futures):
+                spot_id = futures[future]
+                try:
+                    spots.append(future.result())
+                except Exception as e:
+                    print(f"Error analyzing spot {spot_id}: {e}")
+                    errors.append({'spot_id': spot_id, 'error': str(e)})
+                self.progress.emit(
+                    len(spots) + len(errors), total, f"spot {spot_id}")
+
+            spot_ids = sorted(spot['spot_id'] for spot in spots)
+            if self.plot and spot_ids:
+                self.progress.emit(total, total, "plotting")
+                futures = [
+                    executor.submit(
+                        plot_spot_traces, self.data_analyzer, self.folder,
+                        spot_ids[index::workers])
+                    for index in range(min(workers, len(spot_ids)))
+                ]
+                for future in as_completed(futures):
+                    try:
+                        plotted.extend(future.result())
+                    except Exception as e:
+                        print(f"Error plotting speed traces: {e}")
+
+        summary = {
+            'folder': self.folder,
+            'workers': self.workers,
+            'elapsed': time.perf_counter() - start_time,
+            'spots': sorted(spots, key=lambda spot: spot['spot_id']),
+            'errors': errors,
+            'plotted': len(plotted),
+        }
+        try:
+            with open(
+                    os.path.join(self.folder, 'analysis_summary.json'),
+                    'w') as file:
+                json.dump(summary, file, indent=2)
+        except OSError as e:
+            print(f"Error writing analysis summary: {e}")
+        self.completed.emit(summary)
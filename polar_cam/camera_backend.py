@@ -0,0 +1,71 @@
+class CameraBackendError(Exception):
+    pass
+
+class CameraBackend:
+    lossless = False
+
+    def initialize(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def open_device(self):
+        raise NotImplementedError
+
+    def buffer_to_array(self, buffer):
+        raise NotImplementedError
+
+    def buffer_metadata(self, buffer):
+        raise NotImplementedError
+
+    def stop_datastream(self, datastream):
+        raise NotImplementedError
+
+class IdsPeakBackend(CameraBackend):
+    def __init__(self):
+        from ids_peak import ids_peak, ids_peak_ipl_extension
+        self.ids_peak = ids_peak
+        self.ipl_extension = ids_peak_ipl_extension
+
+    def initialize(self):
+        self.ids_peak.Library.Initialize()
+
+    def close(self):
+        self.ids_peak.Library.Close()
+
+    def open_device(self):
+        device_manager = self.ids_peak.DeviceManager.Instance()
+        device_manager.Update()
+
+        if device_manager.Devices().empty():
+            raise CameraBackendError("No device found!")
+
+        device = None
+        for device_descriptor in device_manager.Devices():
+            if device_descriptor.IsOpenable():
+                device = device_descriptor.OpenDevice(
+                    self.ids_peak.DeviceAccessType_Control)
+                break
+
+        if device is None:
+            raise CameraBackendError("Device could not be opened!")
+
+        node_map_remote_device = device.RemoteDevice().NodeMaps()[0]
+
+        datastreams = device.DataStreams()
+        if datastreams.empty():
+            raise CameraBackendError("Device has no DataStream!")
+
+        return device, node_map_remote_device, datastreams[0].OpenDataStream()
+
+    def buffer_to_array(self, buffer):
+        ipl_image = self.ipl_extension.BufferToImage(buffer)
+        return ipl_image.get_numpy_1D(), ipl_image.Height(), ipl_image.Width()
+
+    def buffer_metadata(self, buffer):
+        return buffer.FrameID(), buffer.Timestamp_ns()
+
+    def stop_datastream(self, datastream):
+        datastream.StopAcquisition(self.ids_peak.AcquisitionStopMode_Default)
+        datastream.Flush(self.ids_peak.DataStreamFlushMode_DiscardAll)
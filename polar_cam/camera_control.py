@@ -1,28 +1,116 @@
-from PySide6.QtCore import QObject, Signal, QTimer
-import numpy as np
-from ids_peak import ids_peak, ids_peak_ipl_extension
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+import math
+import queue
+import threading
+import time
 from PySide6.QtGui import QImage
-from .utils import configure_device_component, fetch_camera_parameters
+from .camera_backend import CameraBackendError, IdsPeakBackend
+from .frame_preview import FramePreview
+from .frame_ring import FrameRing
+from .utils import (
+    CachedNodeMap, configure_device_component, fetch_camera_parameters)
+
+GEOMETRY_PARAMETERS = ["OffsetX", "OffsetY", "Width", "Height"]
+GAIN_PARAMETERS = ["AnalogGain", "DigitalGain"]
+PARAMETER_DEPENDENCIES = {
+    "Width": ["OffsetX", "AcquisitionFrameRate", "ExposureTime"],
+    "Height": ["OffsetY", "AcquisitionFrameRate", "ExposureTime"],
+    "OffsetX": ["Width"],
+    "OffsetY": ["Height"],
+    "ExposureTime": ["AcquisitionFrameRate"],
+    "AcquisitionFrameRate": ["ExposureTime"],
+    "AnalogGain": [],
+    "DigitalGain": [],
+}
+
+class AcquisitionWorker(QThread):
+    frames_ready = Signal()
+    failed = Signal(str)
+
+    def __init__(
+            self, camera_control, wait_timeout=5000, error_backoff=50,
+            max_backoff=1000, max_errors=10):
+        super().__init__()
+        self.camera_control = camera_control
+        self.wait_timeout = wait_timeout
+        self.error_backoff = error_backoff
+        self.max_backoff = max_backoff
+        self.max_errors = max_errors
+        self.error_streak = 0
+
+    def run(self):
+        self.error_streak = 0
+        while not self.isInterruptionRequested():
+            captured = self.camera_control.fetch_frame(self.wait_timeout)
+            if captured is None:
+                if self.isInterruptionRequested():
+                    break
+                self.error_streak += 1
+                if self.error_streak >= self.max_errors:
+                    self.failed.emit(
+                        f"Acquisition stopped after {self.error_streak} "
+                        f"consecutive errors.")
+                    break
+                self.msleep(min(
+                    self.error_backoff * 2 ** (self.error_streak - 1),
+                    self.max_backoff))
+                continue
+
+            self.error_streak = 0
+            if self.camera_control.enqueue_frame(captured):
+                self.frames_ready.emit()
 
 class CameraControl(QObject):
     image_acquired = Signal(QImage)
-    frame_captured = Signal(object)
+    frame_captured = Signal(object, object, float)
     camera_error = Signal(str)
-    acquisition_updated = Signal(int, int)
+    acquisition_updated = Signal(int, int, int)
     parameter_updated = Signal(dict)
     acquisition_started = Signal()
     acquisition_stopped = Signal()
 
-    def __init__(self):
+    def __init__(
+            self, backend=None, frame_queue_size=64, frame_ring_spare=16,
+            preview_rate=30.0, buffer_latency=0.5,
+            buffer_memory_limit=512 * 1024 * 1024):
         super().__init__()
+        self.backend = backend if backend is not None else IdsPeakBackend()
         self.device = None
         self.node_map_remote_device = None
         self.datastream = None
         self.latest_frame = None
-        self.acquisition_timer = QTimer()
+        self.frame_queue = queue.Queue(maxsize=frame_queue_size)
+        self.min_frame_queue_size = frame_queue_size
+        self.frame_ring_spare = frame_ring_spare
+        self.frame_ring = None
+        self.buffer_latency = buffer_latency
+        self.buffer_memory_limit = buffer_memory_limit
+        self.buffer_count = 0
+        self.buffer_occupancy = 0
+        self.max_buffer_occupancy = 0
+        self.underrun_counter = 0
+        self.underrun_offset = 0
+        self.frame_condition = threading.Condition()
+        self.drain_pending = False
         self.frame_counter = 0
+        self.delivered_counter = 0
+        self.throughput_start = None
         self.error_counter = 0
+        self.overrun_counter = 0
+        self.dropped_counter = 0
+        self.last_frame_id = None
+        self.last_timestamp = None
+        self.device_clock = None
+        self.max_queue_depth = 0
         self.acquisition_running = False
+        self.last_switch_time = 0.0
+        self.switch_time_total = 0.0
+        self.switch_counter = 0
+        self.acquisition_worker = AcquisitionWorker(self)
+        self.acquisition_worker.frames_ready.connect(self.drain_frame_queue)
+        self.acquisition_worker.failed.connect(self.on_acquisition_failed)
+        self.preview = FramePreview(preview_rate)
+        self.preview.image_ready.connect(self.image_acquired)
         self.parameters = {
             "AcquisitionFrameRate": {"min": 0, "max": 0, "current": 0},
             "ExposureTime": {"min": 0, "max": 0, "current": 0},
@@ -33,7 +121,7 @@ class CameraControl(QObject):
             "AnalogGain": {"min": 0, "max": 0, "current": 0},
             "DigitalGain": {"min": 0, "max": 0, "current": 0},
         }
-        ids_peak.Library.Initialize()
+        self.backend.initialize()
 
     def initialize_and_start_acquisition(self):
         if self.open_device():
@@ -48,43 +136,26 @@ class CameraControl(QObject):
     def destroy_all(self):
         self.stop_acquisition()
         self.close_device()
-        ids_peak.Library.Close()
+        self.backend.close()
 
     def open_device(self):
         try:
-            device_manager = ids_peak.DeviceManager.Instance()
-            device_manager.Update()
-
-            if device_manager.Devices().empty():
-                self.camera_error.emit("No device found!")
-                return False
-
-            for device in device_manager.Devices():
-                if device.IsOpenable():
-                    self.device = device.OpenDevice(
-                        ids_peak.DeviceAccessType_Control)
-                    break
-
-            if self.device is None:
-                self.camera_error.emit("Device could not be opened!")
-                return False
-
-            self.node_map_remote_device = (
-                self.device.RemoteDevice().NodeMaps()[0])
+            self.device, node_map, self.datastream = (
+                self.backend.open_device())
+            self.node_map_remote_device = CachedNodeMap(node_map)
+            self.device_clock = None
+            self.last_timestamp = None
 
             configure_device_component(
                 self.node_map_remote_device, self.camera_error)
 
-            datastreams = self.device.DataStreams()
-            if datastreams.empty():
-                self.camera_error.emit("Device has no DataStream!")
-                self.device = None
-                return False
-
-            self.datastream = datastreams[0].OpenDataStream()
             self.fetch_initial_parameters()
 
             return True
+        except CameraBackendError as e:
+            self.device = None
+            self.camera_error.emit(str(e))
+            return False
         except Exception as e:
             self.camera_error.emit(f"Failed to open device: {str(e)}")
             return False
@@ -95,12 +166,6 @@ class CameraControl(QObject):
             self.parameters, 
             self.camera_error
         )
-        if self.parameters and self.acquisition_running:
-            current_framerate = self.parameters[
-                "AcquisitionFrameRate"]["current"]
-            self.acquisition_timer.setInterval(
-                1000 / current_framerate if current_framerate > 0 else 1000)
-
         self.parameter_updated.emit(self.parameters)
 
     def start_acquisition(self):
@@ -113,16 +178,24 @@ class CameraControl(QObject):
 
         payload_size = (
             self.node_map_remote_device.FindNode("PayloadSize").Value())
-        buffer_count_max = self.datastream.NumBuffersAnnouncedMinRequired()
-        for _ in range(buffer_count_max):
+        self.buffer_count, queue_size, ring_slots = (
+            self.calculate_pool_sizes(payload_size))
+        if queue_size != self.frame_queue.maxsize:
+            self.frame_queue = queue.Queue(maxsize=queue_size)
+        if (
+            self.frame_ring is None or
+            self.frame_ring.payload_size != payload_size or
+            self.frame_ring.slot_count != ring_slots
+        ):
+            self.frame_ring = FrameRing(ring_slots, payload_size)
+
+        for _ in range(self.buffer_count):
             buffer = self.datastream.AllocAndAnnounceBuffer(payload_size)
             self.datastream.QueueBuffer(buffer)
-
-        current_framerate = self.parameters["AcquisitionFrameRate"]["current"]
-        self.acquisition_timer.setInterval(
-            1000 / current_framerate if current_framerate > 0 else 1000)
-        self.acquisition_timer.setSingleShot(False)
-        self.acquisition_timer.timeout.connect(self.fetch_frame)
+        self.buffer_occupancy = 0
+        self.max_buffer_occupancy = 0
+        self.underrun_offset = (
+            self.datastream.NumUnderruns() - self.underrun_counter)
 
         try:
             self.datastream.StartAcquisition()
@@ -133,26 +206,78 @@ class CameraControl(QObject):
             self.camera_error.emit(f"Exception in start_acquisition: {str(e)}")
             return False
 
-        self.acquisition_timer.start()
+        self.clear_frame_queue()
+        self.last_frame_id = None
+        self.throughput_start = (time.perf_counter(), self.delivered_counter)
         self.acquisition_running = True
+        self.acquisition_worker.start()
         self.acquisition_started.emit()
         return True
 
+    def memory_slots(self, payload_size):
+        return max(1, self.buffer_memory_limit // max(payload_size, 1))
+
+    def latency_frames(self):
+        framerate = self.node_map_remote_device.FindNode(
+            "AcquisitionFrameRate").Value()
+        return math.ceil(framerate * self.buffer_latency)
+
+    def calculate_buffer_count(self, payload_size):
+        min_required = self.datastream.NumBuffersAnnouncedMinRequired()
+        memory_cap = self.memory_slots(payload_size) // 2
+        return max(min_required, min(self.latency_frames(), memory_cap))
+
+    def calculate_queue_size(self, payload_size, buffer_count):
+        ring_budget = self.memory_slots(payload_size) - buffer_count
+        wanted = max(self.min_frame_queue_size, self.latency_frames())
+        return max(1, min(wanted, ring_budget - self.frame_ring_spare))
+
+    def calculate_ring_slots(self, payload_size, buffer_count, queue_size):
+        ring_budget = self.memory_slots(payload_size) - buffer_count
+        wanted = queue_size + self.frame_ring_spare
+        return max(1, min(wanted, ring_budget))
+
+    def calculate_pool_sizes(self, payload_size):
+        buffer_count = self.calculate_buffer_count(payload_size)
+        queue_size = self.calculate_queue_size(payload_size, buffer_count)
+        ring_slots = self.calculate_ring_slots(
+            payload_size, buffer_count, queue_size)
+        return buffer_count, queue_size, ring_slots
+
+    def pool_resize_needed(self):
+        payload_size = (
+            self.node_map_remote_device.FindNode("PayloadSize").Value())
+        current = (
+            self.buffer_count, self.frame_queue.maxsize,
+            self.frame_ring.slot_count)
+        return any(
+            needed > size or needed < size // 2
+            for needed, size in zip(
+                self.calculate_pool_sizes(payload_size), current))
+
+    def buffer_statistics(self):
+        return {
+            'buffers': self.buffer_count,
+            'occupancy': self.buffer_occupancy,
+            'max_occupancy': self.max_buffer_occupancy,
+            'underruns': self.underrun_counter,
+        }
+
     def stop_acquisition(self):
         if self.device is None or not self.acquisition_running:
             return
 
+        self.stop_acquisition_worker()
+
         try:
             self.node_map_remote_device.FindNode("AcquisitionStop").Execute()
-            self.datastream.StopAcquisition(
-                ids_peak.AcquisitionStopMode_Default)
-            self.datastream.Flush(ids_peak.DataStreamFlushMode_DiscardAll)
+            self.backend.stop_datastream(self.datastream)
 
             for buffer in self.datastream.AnnouncedBuffers():
                 self.datastream.RevokeBuffer(buffer)
 
             self.acquisition_running = False
-            self.acquisition_timer.stop()
+            self.drain_frame_queue()
             self.acquisition_stopped.emit()
         except Exception as e:
             self.camera_error.emit(f"Error stopping acquisition: {str(e)}")
@@ -167,40 +292,168 @@ class CameraControl(QObject):
 
         self.device = None
 
-    def fetch_frame(self):
+    def stop_acquisition_worker(self):
+        if not self.acquisition_worker.isRunning():
+            return
+
+        self.acquisition_worker.requestInterruption()
         try:
-            buffer = self.datastream.WaitForFinishedBuffer(5000)
-            ipl_image = ids_peak_ipl_extension.BufferToImage(buffer)
+            self.datastream.KillWait()
+        except Exception:
+            pass
+        self.acquisition_worker.wait()
+
+    @Slot(str)
+    def on_acquisition_failed(self, error_message):
+        self.camera_error.emit(error_message)
+        self.stop_acquisition()
+
+    def report_fetch_error(self, error):
+        self.error_counter += 1
+        if self.acquisition_worker.error_streak == 0:
+            self.camera_error.emit(f"Error fetching frame: {str(error)}")
+
+    def fetch_frame(self, timeout=5000):
+        try:
+            buffer = self.datastream.WaitForFinishedBuffer(timeout)
+        except Exception as e:
+            if not self.acquisition_worker.isInterruptionRequested():
+                self.report_fetch_error(e)
+            return None
+
+        try:
+            frame_id, timestamp_ns = self.backend.buffer_metadata(buffer)
+            image_np_array = self.frame_ring.store(
+                *self.backend.buffer_to_array(buffer))
+        except Exception as e:
+            self.report_fetch_error(e)
+            return None
+        finally:
             self.datastream.QueueBuffer(buffer)
 
-            image_np_array = ipl_image.get_numpy_1D().reshape(
-                (ipl_image.Height(), ipl_image.Width()))
-            image_qt = QImage(
-                image_np_array.data,
-                image_np_array.shape[1],
-                image_np_array.shape[0],
-                QImage.Format_Grayscale8,
-            )
+        self.buffer_occupancy = self.datastream.NumBuffersAwaitDelivery()
+        self.underrun_counter = (
+            self.datastream.NumUnderruns() - self.underrun_offset)
+        self.max_buffer_occupancy = max(
+            self.max_buffer_occupancy, self.buffer_occupancy)
 
-            self.latest_frame = np.copy(image_np_array)
+        timestamp = self.frame_timestamp(frame_id, timestamp_ns)
+        if (
+            self.last_frame_id is not None and
+            frame_id > self.last_frame_id + 1
+        ):
+            self.dropped_counter += frame_id - self.last_frame_id - 1
+        self.last_frame_id = frame_id
 
-            self.image_acquired.emit(image_qt.copy())
-            self.frame_captured.emit(self.latest_frame)
+        with self.frame_condition:
+            self.latest_frame = image_np_array
             self.frame_counter += 1
-            self.acquisition_updated.emit(
-                self.frame_counter, self.error_counter)
-        except Exception as e:
-            self.error_counter += 1
-            self.camera_error.emit(f"Error fetching frame: {str(e)}")
+            self.frame_condition.notify_all()
+
+        return image_np_array, frame_id, timestamp
+
+    def frame_timestamp(self, frame_id, timestamp_ns):
+        if self.device_clock is None:
+            self.device_clock = bool(timestamp_ns)
+        if not self.device_clock:
+            timestamp = time.perf_counter()
+        elif timestamp_ns:
+            timestamp = timestamp_ns / 1e9
+        else:
+            frames = (
+                1 if self.last_frame_id is None else
+                max(frame_id - self.last_frame_id, 1))
+            framerate = self.parameters["AcquisitionFrameRate"]["current"]
+            timestamp = self.last_timestamp + frames / max(framerate, 1e-3)
+        self.last_timestamp = timestamp
+        return timestamp
+
+    def dropped_frames(self):
+        return self.dropped_counter + self.overrun_counter
+
+    def enqueue_frame(self, captured):
+        if self.backend.lossless:
+            if not self.put_frame(captured):
+                return False
+        else:
+            try:
+                self.frame_queue.put_nowait(captured)
+            except queue.Full:
+                try:
+                    self.frame_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.overrun_counter += 1
+                self.frame_queue.put_nowait(captured)
+
+        self.max_queue_depth = max(
+            self.max_queue_depth, self.frame_queue.qsize())
+
+        with self.frame_condition:
+            if self.drain_pending:
+                return False
+            self.drain_pending = True
+            return True
+
+    def put_frame(self, captured):
+        while not self.acquisition_worker.isInterruptionRequested():
+            try:
+                self.frame_queue.put(captured, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def throughput(self):
+        if self.throughput_start is None:
+            return 0.0
+        start_time, start_count = self.throughput_start
+        elapsed = time.perf_counter() - start_time
+        if elapsed <= 0:
+            return 0.0
+        return (self.delivered_counter - start_count) / elapsed
+
+    def queue_depth(self):
+        return self.frame_queue.qsize()
+
+    def last_exposed_frame_id(self):
+        if self.last_frame_id is None:
+            return None
+        return self.last_frame_id + self.datastream.NumBuffersAwaitDelivery()
+
+    def clear_frame_queue(self):
+        while True:
+            try:
+                self.frame_queue.get_nowait()
+            except queue.Empty:
+                break
+        self.max_queue_depth = 0
+
+    @Slot()
+    def drain_frame_queue(self):
+        with self.frame_condition:
+            self.drain_pending = False
+
+        frame = None
+        for _ in range(self.frame_queue.qsize()):
+            try:
+                frame, frame_id, timestamp = self.frame_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.frame_captured.emit(frame, frame_id, timestamp)
+            self.delivered_counter += 1
+
+        if frame is None:
+            return
+
+        self.preview.on_frame(frame)
+        self.acquisition_updated.emit(
+            self.frame_counter, self.dropped_frames(), self.error_counter)
 
     def set_gain(self, gain_type, value):
         try:
-            if gain_type in ["AnalogGain", "DigitalGain"]:
-                gain_selector_value = (
-                    "AnalogAll" if gain_type == "AnalogGain" else "DigitalAll"
-                )
-                self.node_map_remote_device.FindNode("GainSelector")\
-                    .SetCurrentEntry(gain_selector_value)
+            if gain_type in GAIN_PARAMETERS:
+                self.node_map_remote_device.select_gain(gain_type)
                 self.node_map_remote_device.FindNode("Gain").SetValue(value)
                 self.parameters[gain_type]["current"] = value
             else:
@@ -208,24 +461,110 @@ class CameraControl(QObject):
         except Exception as e:
             self.camera_error.emit(f"Error setting {gain_type}: {str(e)}")
 
+    def order_parameter_updates(self, updates):
+        ordered = []
+
+        for offset, size in [("OffsetX", "Width"), ("OffsetY", "Height")]:
+            pair = [size, offset]
+            if (
+                size in updates and
+                self.is_increase(size, updates[size]['current'])
+            ):
+                pair = [offset, size]
+            ordered.extend(name for name in pair if name in updates)
+
+        pair = ["AcquisitionFrameRate", "ExposureTime"]
+        if (
+            "AcquisitionFrameRate" in updates and
+            self.is_increase(
+                "AcquisitionFrameRate",
+                updates["AcquisitionFrameRate"]['current'])
+        ):
+            pair = ["ExposureTime", "AcquisitionFrameRate"]
+        ordered.extend(name for name in pair if name in updates)
+
+        ordered.extend(name for name in updates if name not in ordered)
+        return ordered
+
+    def is_increase(self, parameter_name, value):
+        if value == "max":
+            return True
+        if value == "min":
+            return False
+        return value > self.parameters[parameter_name]["current"]
+
+    def resolve_parameter_value(self, node, value):
+        if value == "max":
+            return node.Maximum()
+        if value == "min":
+            return node.Minimum()
+        return value
+
+    def refresh_parameters(self, parameter_names):
+        limit_names = set()
+        for parameter_name in parameter_names:
+            limit_names.update(PARAMETER_DEPENDENCIES.get(parameter_name, []))
+
+        parameters = fetch_camera_parameters(
+            self.node_map_remote_device,
+            self.parameters,
+            self.camera_error,
+            limit_names.union(parameter_names),
+            limit_names
+        )
+        if parameters:
+            self.parameters = parameters
+
     def set_parameters(self, updates):
+        start_time = time.perf_counter()
+        restart = (
+            self.acquisition_running and
+            any(name in GEOMETRY_PARAMETERS for name in updates)
+        )
+        written = []
+
         try:
-            self.stop_acquisition()
-            for parameter_name, values in updates.items():
-                if parameter_name in ["AnalogGain", "DigitalGain"]:
-                    self.set_gain(parameter_name, values['current'])
+            if restart:
+                self.stop_acquisition()
+            for parameter_name in self.order_parameter_updates(updates):
+                current_value = updates[parameter_name]['current']
+                if parameter_name in GAIN_PARAMETERS:
+                    self.set_gain(parameter_name, current_value)
                 elif parameter_name in self.parameters:
-                    current_value = values['current']
                     node = self.node_map_remote_device.FindNode(parameter_name)
-                    if node is not None:
-                        node.SetValue(current_value)
+                    current_value = self.resolve_parameter_value(
+                        node, current_value)
+                    node.SetValue(current_value)
                     self.parameters[parameter_name]["current"] = current_value
-            self.fetch_initial_parameters()
-            self.parameter_updated.emit(self.parameters)
-            self.start_acquisition()
+                written.append(parameter_name)
         except Exception as e:
             self.camera_error.emit(f"Error setting parameters: {str(e)}")
-
-    def get_current_frame(self):
-        self.fetch_frame()
-        return self.latest_frame
+        finally:
+            self.refresh_parameters(written)
+            self.parameter_updated.emit(self.parameters)
+            if (
+                not restart and self.acquisition_running and
+                "AcquisitionFrameRate" in written and
+                self.pool_resize_needed()
+            ):
+                self.stop_acquisition()
+                restart = True
+            if restart:
+                self.start_acquisition()
+
+        self.last_switch_time = time.perf_counter() - start_time
+        self.switch_time_total += self.last_switch_time
+        self.switch_counter += 1
+
+    def get_current_frame(self, timeout=5.0):
+        if not self.acquisition_running:
+            return self.latest_frame
+
+        with self.frame_condition:
+            target = self.frame_counter + 1
+            self.frame_condition.wait_for(
+                lambda: (
+                    self.frame_counter >= target or
+                    self.frame_queue.full()),
+                timeout)
+            return self.latest_frame
@@ -3,14 +3,40 @@ import numpy as np
 import matplotlib.pyplot as plt
 from scipy import signal
 
+SIGNAL_LABELS = ['I0', 'I1', 'ANIS', 'ITOT']
+TRACE_FIELDS = ['time', 'frequency', 'power']
+
+def method_prefix(name, method):
+    return name if method == 'welch' else f'{name}_{method}'
+
+def speed_traces_path(output_directory, spot_id, method='welch'):
+    prefix = method_prefix('speed_traces', method)
+    return os.path.join(output_directory, f'{prefix}_spot_{spot_id}.npz')
+
+def save_speed_traces(path, traces):
+    np.savez(path, **{
+        f"{label}_{field}": trace[field]
+        for label, trace in traces.items() for field in TRACE_FIELDS
+    })
+
+def load_speed_traces(path):
+    with np.load(path) as data:
+        return {
+            label: {field: data[f"{label}_{field}"] for field in TRACE_FIELDS}
+            for label in SIGNAL_LABELS if f"{label}_time" in data.files
+        }
+
 class DataAnalyzer:
+    method = 'welch'
+
     def __init__(self, nperseg=400, nfft=1600, windowsize=400, overlap=200):
         self.nperseg = nperseg
         self.nfft = nfft
         self.windowsize = windowsize
         self.overlap = overlap
+        self.window = None
 
-    def analyze(self, intensities, timestamps, spot_id, output_directory):
+    def polar_signals(self, intensities):
         c90 = np.array(intensities['90'])
         c45 = np.array(intensities['45'])
         c135 = np.array(intensities['135'])
@@ -21,54 +47,115 @@ class DataAnalyzer:
         ANIS = I0 + 1j * I1
         ITOT = c90 + c0 + c45 + c135
 
-        signals = {
+        return {
             'I0': I0,
             'I1': I1,
             'ANIS': ANIS,
             'ITOT': ITOT
         }
 
-        self.fft_welch(signals, timestamps, spot_id, output_directory)
+    def analyze(
+            self, intensities, timestamps, spot_id, output_directory,
+            visits=None, plot=False):
+        signals = self.polar_signals(intensities)
+        traces = self.speed_traces(signals, timestamps, visits=visits)
+        save_speed_traces(
+            speed_traces_path(output_directory, spot_id, self.method), traces)
+        if plot:
+            self.plot_speed_traces(traces, spot_id, output_directory)
+        return traces
 
-    def fft_welch(
-            self, signals, timestamps, spot_id, output_directory, threshold=1):
-        plt.figure(figsize=(14, 8))
+    def visit_labels(self, visits, length):
+        labels = np.full(length, -1)
+        for index, (start, end) in enumerate(visits):
+            labels[start:end] = index
+        return labels
 
-        for label, intensity in signals.items():
-            n_seg = int((len(intensity) - self.overlap) / self.overlap)
-            dom_freq = []
-            current_time_segments = []
+    def welch_window(self):
+        if self.window is None or len(self.window) != self.nperseg:
+            self.window = signal.get_window('hann', self.nperseg)
+        return self.window
 
-            for i in range(n_seg):
-                start = i * self.overlap
-                end = start + self.windowsize
-                segment = intensity[start:end]
+    def window_starts(self, length, labels=None):
+        n_seg = int((length - self.overlap) / self.overlap)
+        starts = np.arange(max(n_seg, 0)) * self.overlap
+        starts = starts[starts + self.windowsize <= length]
+        if labels is not None:
+            starts = starts[
+                labels[starts] == labels[starts + self.windowsize - 1]]
+        return starts
 
-                if len(segment) < self.windowsize:
-                    continue
+    def sliding_welch(
+            self, intensity, timestamps, labels=None, threshold=1,
+            chunk_size=1024):
+        intensity = np.asarray(intensity)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        starts = self.window_starts(len(intensity), labels)
+        if len(starts) == 0:
+            return np.empty(0), np.empty(0), np.empty(0)
+
+        last = starts + self.windowsize - 1
+        fs = (self.windowsize - 1) / (timestamps[last] - timestamps[starts])
+        time_centers = (timestamps[starts] + timestamps[last]) / 2
+
+        windows = np.lib.stride_tricks.sliding_window_view(
+            intensity, self.windowsize)
+        dominant = np.empty(len(starts))
+        peak_power = np.empty(len(starts))
+        for chunk_start in range(0, len(starts), chunk_size):
+            chunk = slice(chunk_start, chunk_start + chunk_size)
+            dominant[chunk], peak_power[chunk] = self.welch_peaks(
+                windows[starts[chunk]], fs[chunk])
+
+        keep = peak_power >= threshold
+        return time_centers[keep], dominant[keep], peak_power[keep]
+
+    def welch_peaks(self, windows, fs):
+        window = self.welch_window()
+        step = self.nperseg - self.nperseg // 2
+        segments = np.lib.stride_tricks.sliding_window_view(
+            windows, self.nperseg, axis=-1)[..., ::step, :]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        if np.iscomplexobj(windows):
+            bin_frequencies = np.fft.fftfreq(self.nfft)
+            spectrum = np.fft.fft(segments * window, n=self.nfft)
+        else:
+            bin_frequencies = np.fft.rfftfreq(self.nfft)
+            spectrum = np.fft.rfft(segments * window, n=self.nfft)
+        power = (np.abs(spectrum) ** 2).mean(axis=-2)
+        if not np.iscomplexobj(windows):
+            power[..., 1:self.nfft - self.nfft // 2] *= 2
+
+        peak_bins = np.argmax(power, axis=-1)
+        peak_power = np.take_along_axis(
+            power, peak_bins[..., None], axis=-1)[..., 0]
+        peak_power = peak_power / (fs * (window ** 2).sum())
+        return bin_frequencies[peak_bins] * fs, peak_power
+
+    def speed_traces(self, signals, timestamps, visits=None):
+        return self.fft_welch(signals, timestamps, visits=visits)
 
-                segment_timestamps = timestamps[start:end]
-                fs = 1 / np.mean(np.diff(segment_timestamps))
-
-                is_complex = np.iscomplexobj(segment)
-                freqs, power = signal.welch(
-                    segment, 
-                    fs=fs, 
-                    nperseg=self.nperseg, 
-                    nfft=self.nfft, 
-                    return_onesided=not is_complex
-                )
-                magnitude = np.abs(power)
-
-                if np.max(magnitude) >= threshold:
-                    dominant_frequency = freqs[np.argmax(magnitude)]
-                    dom_freq.append(dominant_frequency)
-                    current_time_segments.append(
-                        (segment_timestamps[0] + segment_timestamps[-1]) / 2
-                    )
-
-            if dom_freq:
-                plt.plot(current_time_segments, dom_freq, label=label)
+    def fft_welch(self, signals, timestamps, threshold=1, visits=None):
+        labels = None
+        if visits is not None and len(visits) > 1:
+            labels = self.visit_labels(visits, len(timestamps))
+
+        traces = {}
+        for label, intensity in signals.items():
+            time_centers, dom_freq, peak_power = self.sliding_welch(
+                intensity, timestamps, labels, threshold)
+            traces[label] = {
+                'time': time_centers,
+                'frequency': dom_freq,
+                'power': peak_power,
+            }
+        return traces
+
+    def plot_speed_traces(self, traces, spot_id, output_directory):
+        plt.figure(figsize=(14, 8))
+        for label, trace in traces.items():
+            if len(trace['frequency']):
+                plt.plot(trace['time'], trace['frequency'], label=label)
 
         plt.title(f'Speed-Time Diagram for Spot {spot_id}')
         plt.xlabel('Time (s)')
@@ -76,7 +163,88 @@ class DataAnalyzer:
         plt.legend()
         plt.grid(True)
         plt.tight_layout()
+        prefix = method_prefix('speed_time_diagram', self.method)
         plot_filename = os.path.join(
-            output_directory, f'speed_time_diagram_spot_{spot_id}.png')
+            output_directory, f'{prefix}_spot_{spot_id}.png')
         plt.savefig(plot_filename)
         plt.close()
+
+    def plot_sample_folder(self, output_directory, spot_ids=None):
+        prefix = method_prefix('speed_traces', self.method) + '_spot_'
+        if spot_ids is not None:
+            spot_ids = {str(spot_id) for spot_id in spot_ids}
+        plotted = []
+        for file in sorted(os.listdir(output_directory)):
+            if file.startswith(prefix) and file.endswith('.npz'):
+                spot_id = file[len(prefix):-len('.npz')]
+                if spot_ids is not None and spot_id not in spot_ids:
+                    continue
+                traces = load_speed_traces(
+                    os.path.join(output_directory, file))
+                self.plot_speed_traces(traces, spot_id, output_directory)
+                plotted.append(spot_id)
+        return plotted
+
+class PhaseAnalyzer(DataAnalyzer):
+    method = 'phase'
+
+    def __init__(self, smoothing=51, amplitude_threshold=0.05, **options):
+        super().__init__(**options)
+        self.smoothing = smoothing
+        self.amplitude_threshold = amplitude_threshold
+
+    def moving_average(self, values):
+        width = min(self.smoothing, len(values))
+        if width <= 1:
+            return np.asarray(values, dtype=np.float64)
+        padded = np.pad(values, (width // 2, width - 1 - width // 2), 'edge')
+        cumulative = np.concatenate(([0.0], np.cumsum(padded)))
+        return (cumulative[width:] - cumulative[:-width]) / width
+
+    def phase_speed(self, anis, timestamps):
+        phase = np.unwrap(np.angle(anis))
+        half = max(self.smoothing // 2, 1)
+        indices = np.arange(len(phase))
+        upper = np.minimum(indices + half, len(phase) - 1)
+        lower = np.maximum(indices - half, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frequency = (phase[upper] - phase[lower]) / (
+                2 * np.pi * (timestamps[upper] - timestamps[lower]))
+        power = self.moving_average(np.abs(anis)) ** 2
+        return frequency, power
+
+    def speed_traces(self, signals, timestamps, visits=None):
+        anis = np.asarray(signals['ANIS'])
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if not visits:
+            visits = [(0, len(timestamps))]
+
+        times, frequencies, powers = [], [], []
+        for start, end in visits:
+            end = len(timestamps) if end is None else min(end, len(timestamps))
+            if end - start < 2:
+                continue
+            segment = anis[start:end]
+            segment_timestamps = timestamps[start:end]
+            valid = np.isfinite(segment)
+            if valid.sum() < 2:
+                continue
+            segment = segment[valid]
+            segment_timestamps = segment_timestamps[valid]
+
+            frequency, power = self.phase_speed(segment, segment_timestamps)
+            keep = (
+                np.isfinite(frequency) &
+                (power >= self.amplitude_threshold ** 2))
+            times.append(segment_timestamps[keep])
+            frequencies.append(frequency[keep])
+            powers.append(power[keep])
+
+        return {
+            'ANIS': {
+                'time': np.concatenate(times) if times else np.empty(0),
+                'frequency': (
+                    np.concatenate(frequencies) if times else np.empty(0)),
+                'power': np.concatenate(powers) if times else np.empty(0),
+            }
+        }
@@ -0,0 +1,82 @@
+import math
+import time
+import numpy as np
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+from PySide6.QtGui import QImage
+
+class FramePreview(QObject):
+    image_ready = Signal(QImage)
+
+    def __init__(self, max_rate=30.0):
+        super().__init__()
+        self.max_rate = max_rate
+        self.target_width = 0
+        self.target_height = 0
+        self.pending_frame = None
+        self.last_render_time = 0.0
+        self.rendered_counter = 0
+        self.skipped_counter = 0
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_pending_frame)
+
+    def set_max_rate(self, max_rate):
+        self.max_rate = max_rate
+
+    @Slot(int, int)
+    def set_target_size(self, width, height):
+        self.target_width = width
+        self.target_height = height
+
+    @Slot(object)
+    def on_frame(self, frame):
+        if self.pending_frame is not None:
+            self.skipped_counter += 1
+        self.pending_frame = frame
+
+        if self.render_timer.isActive():
+            return
+
+        interval = 1 / self.max_rate if self.max_rate > 0 else 0.0
+        delay = self.last_render_time + interval - time.perf_counter()
+        self.render_timer.start(max(0, int(delay * 1000)))
+
+    def downsample_step(self, height, width):
+        if self.target_width <= 0 or self.target_height <= 0:
+            return 1
+        return max(
+            1,
+            math.ceil(width / self.target_width),
+            math.ceil(height / self.target_height),
+        )
+
+    def downsample(self, frame):
+        step = self.downsample_step(*frame.shape)
+        if step > 1:
+            step = 2 * math.ceil(step / 2)
+            height, width = frame.shape
+            frame = frame[:height - height % 2, :width - width % 2]
+            total = frame[0::step, 0::step].astype(np.uint16)
+            total += frame[0::step, 1::step]
+            total += frame[1::step, 0::step]
+            total += frame[1::step, 1::step]
+            frame = (total >> 2).astype(np.uint8)
+        return np.ascontiguousarray(frame)
+
+    def render_pending_frame(self):
+        frame = self.pending_frame
+        self.pending_frame = None
+        if frame is None:
+            return
+
+        self.last_render_time = time.perf_counter()
+        frame = self.downsample(frame)
+        image_qt = QImage(
+            frame.data,
+            frame.shape[1],
+            frame.shape[0],
+            frame.strides[0],
+            QImage.Format_Grayscale8,
+        )
+        self.image_ready.emit(image_qt.copy())
+        self.rendered_counter += 1
@@ -0,0 +1,61 @@
+import threading
+import numpy as np
+
+class FrameSlot:
+    def __init__(self, ring, index, frame):
+        self.ring = ring
+        self.index = index
+        self.frame = frame
+        interface = dict(frame.__array_interface__)
+        interface['data'] = (interface['data'][0], True)
+        self.__array_interface__ = interface
+
+    def __del__(self):
+        self.ring.release_slot(self.index)
+
+class FrameRing:
+    def __init__(self, slot_count, payload_size):
+        self.slot_count = slot_count
+        self.payload_size = payload_size
+        self.storage = np.empty((slot_count, payload_size), dtype=np.uint8)
+        self.free_slots = list(range(slot_count - 1, -1, -1))
+        self.lock = threading.Lock()
+        self.fallback_counter = 0
+        self.max_slots_in_use = 0
+
+    def acquire_slot(self):
+        with self.lock:
+            if not self.free_slots:
+                return None
+            index = self.free_slots.pop()
+            self.max_slots_in_use = max(
+                self.max_slots_in_use,
+                self.slot_count - len(self.free_slots))
+            return index
+
+    def release_slot(self, index):
+        with self.lock:
+            self.free_slots.append(index)
+
+    def slots_in_use(self):
+        with self.lock:
+            return self.slot_count - len(self.free_slots)
+
+    def store(self, source, height, width):
+        size = height * width
+        index = self.acquire_slot() if size <= self.payload_size else None
+
+        if index is None:
+            self.fallback_counter += 1
+            frame = np.empty((height, width), dtype=np.uint8)
+            np.copyto(frame, source[:size].reshape(height, width))
+            frame.flags.writeable = False
+            return frame
+
+        frame = self.storage[index, :size].reshape(height, width)
+        try:
+            np.copyto(frame, source[:size].reshape(height, width))
+        except Exception:
+            self.release_slot(index)
+            raise
+        return np.asarray(FrameSlot(self, index, frame))
@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import numpy as np
+from polar_cam.spot_data import NPY_HEADER_SIZE, ColumnFile, npy_header
+
+FRAME_STACK_VERSION = 1
+FRAME_INDEX_DTYPE = np.dtype([('frame_id', '<i8'), ('timestamp', '<f8')])
+
+def frame_stack_paths(path):
+    base = os.path.splitext(path)[0]
+    return f"{base}_index.npy", f"{base}_metadata.json"
+
+class FrameStackFull(OSError):
+    pass
+
+class FrameStackWriter:
+    def __init__(
+            self, path, crops=None, max_bytes=None, grow_frames=128,
+            reserve_bytes=1024 ** 3, flush_frames=64):
+        self.path = path
+        self.index_path, self.metadata_path = frame_stack_paths(path)
+        self.crops = crops
+        self.max_bytes = max_bytes
+        self.grow_frames = grow_frames
+        self.reserve_bytes = reserve_bytes
+        self.flush_frames = flush_frames
+        self.frame_bytes = 0
+        self.windows = None
+        self.frame_shape = None
+        self.source_shape = None
+        self.capacity = 0
+        self.frame_count = 0
+        self.stack = None
+        self.file = None
+        self.index = None
+
+    def crop_windows(self, frame_shape):
+        frame_height, frame_width = frame_shape
+        width = max(crop['width'] for crop in self.crops)
+        height = max(crop['height'] for crop in self.crops)
+        width = min(width + width % 2, frame_width)
+        height = min(height + height % 2, frame_height)
+
+        windows = []
+        for crop in self.crops:
+            x = min(max(crop['x'], 0), frame_width - width)
+            y = min(max(crop['y'], 0), frame_height - height)
+            windows.append({
+                'id': crop['id'], 'x': x - x % 2, 'y': y - y % 2,
+                'width': width, 'height': height
+            })
+        return windows
+
+    def allocate(self, frame_shape):
+        if self.crops:
+            self.windows = self.crop_windows(frame_shape)
+            self.frame_shape = (
+                len(self.windows), self.windows[0]['height'],
+                self.windows[0]['width'])
+        else:
+            self.frame_shape = tuple(frame_shape)
+
+        self.frame_bytes = int(np.prod(self.frame_shape))
+        self.file = open(self.path, 'w+b')
+        self.file.write(npy_header(np.uint8, (0,) + self.frame_shape))
+        self.index = ColumnFile(self.index_path, FRAME_INDEX_DTYPE)
+        self.grow()
+        self.write_metadata()
+
+    def grow(self):
+        capacity = self.capacity + self.grow_frames
+        if self.max_bytes is not None:
+            capacity = min(capacity, self.max_bytes // self.frame_bytes)
+        free_bytes = shutil.disk_usage(
+            os.path.dirname(os.path.abspath(self.path))).free
+        capacity = min(
+            capacity,
+            self.capacity +
+            (free_bytes - self.reserve_bytes) // self.frame_bytes)
+        if capacity <= self.capacity:
+            raise FrameStackFull(
+                f"No space left for the frame stack after "
+                f"{self.frame_count} frames.")
+
+        if self.stack is not None:
+            self.stack.flush()
+            self.stack = None
+        self.file.truncate(NPY_HEADER_SIZE + capacity * self.frame_bytes)
+        self.capacity = capacity
+        self.stack = np.memmap(
+            self.file, dtype=np.uint8, mode='r+', offset=NPY_HEADER_SIZE,
+            shape=(self.capacity,) + self.frame_shape)
+
+    def write_metadata(self):
+        metadata = {
+            'format_version': FRAME_STACK_VERSION,
+            'source_shape': list(self.source_shape),
+            'frame_shape': list(self.frame_shape),
+            'frame_count': self.frame_count,
+            'crops': self.windows,
+        }
+        with open(self.metadata_path, 'w') as file:
+            json.dump(metadata, file, indent=2)
+
+    def write(self, frame, frame_id, timestamp):
+        if self.stack is None:
+            self.source_shape = frame.shape
+            self.allocate(frame.shape)
+        elif frame.shape != self.source_shape:
+            raise ValueError(
+                f"Frame shape {frame.shape} does not match the recording "
+                f"shape {self.source_shape}.")
+        if self.frame_count >= self.capacity:
+            self.grow()
+
+        if self.windows:
+            for n, window in enumerate(self.windows):
+                x, y = window['x'], window['y']
+                self.stack[self.frame_count, n] = frame[
+                    y:y + window['height'], x:x + window['width']]
+        else:
+            self.stack[self.frame_count] = frame
+
+        self.index.append(np.array(
+            [(frame_id, timestamp)], dtype=FRAME_INDEX_DTYPE))
+        self.frame_count += 1
+        if self.frame_count % self.flush_frames == 0:
+            self.flush()
+
+    def flush(self):
+        if self.stack is not None:
+            self.stack.flush()
+        self.file.seek(0)
+        self.file.write(
+            npy_header(np.uint8, (self.frame_count,) + self.frame_shape))
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        if self.file is None:
+            return
+
+        self.flush()
+        self.stack = None
+        self.file.truncate(
+            NPY_HEADER_SIZE + self.frame_count * self.frame_bytes)
+        self.file.close()
+        self.file = None
+        self.index.close()
+        self.write_metadata()
+
+class FrameStack:
+    def __init__(self, path):
+        self.path = path
+        index_path, metadata_path = frame_stack_paths(path)
+        self.frames = np.load(path, mmap_mode='r')
+        self.metadata = {}
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r') as file:
+                self.metadata = json.load(file)
+        if os.path.exists(index_path):
+            self.index = np.load(index_path, mmap_mode='r')
+        else:
+            self.index = np.zeros(len(self.frames), dtype=FRAME_INDEX_DTYPE)
+
+        frame_count = min(len(self.frames), len(self.index))
+        self.frames = self.frames[:frame_count]
+        self.index = self.index[:frame_count]
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def frame_ids(self):
+        return self.index['frame_id']
+
+    @property
+    def timestamps(self):
+        return self.index['timestamp']
+
+    @property
+    def crops(self):
+        return self.metadata.get('crops')
+
+    def crop_frames(self, crop_index):
+        return self.frames[:, crop_index]
+
+    def image_frames(self, crop_index=None):
+        if self.frames.ndim == 4:
+            if crop_index is None:
+                raise ValueError(
+                    f"{self.path} holds spot crops; choose one with "
+                    f"crop_index.")
+            return self.crop_frames(crop_index)
+        if crop_index is not None:
+            raise ValueError(f"{self.path} holds full frames, not crops.")
+        return self.frames
+
+    def chunks(self, frames=None, chunk_size=256):
+        frames = self.frames if frames is None else frames
+        for start in range(0, len(frames), chunk_size):
+            yield start, frames[start:start + chunk_size]
+
+    def mean_image(self, frames=None, max_frames=None, chunk_size=256):
+        frames = self.frames if frames is None else frames
+        if max_frames is not None:
+            frames = frames[:max_frames]
+
+        total = np.zeros(frames.shape[1:], dtype=np.float64)
+        for _, chunk in self.chunks(frames, chunk_size):
+            total += chunk.sum(axis=0, dtype=np.float64)
+        return (total / max(len(frames), 1)).astype(np.uint8)
@@ -0,0 +1,160 @@
+from PySide6.QtCore import QObject, Signal, Slot
+import numpy as np
+
+class AutoGainController(QObject):
+    progress = Signal(str)
+    converged = Signal(int)
+
+    def __init__(
+            self, camera_control, target_value=150, saturation_value=220,
+            measure_frames=10, verify_frames=2, settle_frames=2,
+            max_iterations=10):
+        super().__init__()
+        self.camera_control = camera_control
+        self.target_value = target_value
+        self.saturation_value = saturation_value
+        self.measure_frames = measure_frames
+        self.verify_frames = verify_frames
+        self.settle_frames = settle_frames
+        self.max_iterations = max_iterations
+        self.active = False
+        self.iteration = 0
+        self.adjustment_made = False
+        self.max_pixel_value = 0
+        self.frames_to_measure = 0
+        self.frames_to_skip = 0
+        self.skip_frame_id = None
+        self.frames_used = 0
+        self.expected_max_pixel_value = None
+        self.verify_tolerance = 0.0
+
+    def start(self, target_value=None):
+        if target_value is not None:
+            self.target_value = target_value
+
+        self.active = True
+        self.iteration = 0
+        self.adjustment_made = False
+        self.frames_used = 0
+        self.expected_max_pixel_value = None
+        self.begin_measurement(self.measure_frames)
+        self.progress.emit("Measuring max pixel value...")
+
+    def verify(self, expected_max_pixel_value, tolerance, target_value=None):
+        self.start(target_value)
+        self.expected_max_pixel_value = expected_max_pixel_value
+        self.verify_tolerance = tolerance
+        self.begin_measurement(self.verify_frames)
+        self.progress.emit("Verifying cached gains...")
+
+    def stop(self):
+        self.active = False
+
+    def begin_measurement(self, frame_count):
+        self.max_pixel_value = 0
+        self.frames_to_measure = frame_count
+        self.skip_frame_id = self.camera_control.last_exposed_frame_id()
+        self.frames_to_skip = self.settle_frames
+
+    @Slot(object, object, float)
+    def on_frame(self, frame, frame_id, timestamp):
+        if not self.active:
+            return
+
+        self.frames_used += 1
+        if self.skip_frame_id is not None and frame_id <= self.skip_frame_id:
+            return
+        if self.frames_to_skip > 0:
+            self.frames_to_skip -= 1
+            return
+
+        self.max_pixel_value = max(self.max_pixel_value, int(np.max(frame)))
+        self.frames_to_measure -= 1
+        if self.frames_to_measure <= 0:
+            self.evaluate()
+
+    def evaluate(self):
+        parameters = self.camera_control.parameters
+        analog = parameters["AnalogGain"]
+        digital = parameters["DigitalGain"]
+        max_pixel_value = self.max_pixel_value
+
+        if self.expected_max_pixel_value is not None:
+            expected = self.expected_max_pixel_value
+            self.expected_max_pixel_value = None
+            if (
+                expected > 0 and
+                max_pixel_value <= self.saturation_value and
+                abs(max_pixel_value - expected) / expected <=
+                self.verify_tolerance
+            ):
+                self.finish("Cached gains verified.")
+                return
+            self.progress.emit(
+                f"Max pixel value {max_pixel_value} drifted from cached "
+                f"{expected}, re-adjusting gains..."
+            )
+
+        if self.adjustment_made:
+            if max_pixel_value <= self.saturation_value:
+                self.finish()
+                return
+            if (
+                analog["current"] <= analog["min"] and
+                digital["current"] <= digital["min"] and
+                max_pixel_value < self.target_value
+            ):
+                self.finish("Both gains are at their minimum values.")
+                return
+            if (
+                analog["current"] >= analog["max"] and
+                digital["current"] >= digital["max"] and
+                max_pixel_value > self.target_value
+            ):
+                self.finish("Both gains are at their maximum values.")
+                return
+
+        if max_pixel_value == 0 or self.iteration >= self.max_iterations:
+            self.finish()
+            return
+
+        current_total_gain = analog["current"] * digital["current"]
+        required_total_gain = round(
+            (self.target_value / max_pixel_value) * current_total_gain, 2)
+
+        new_analog_gain = min(
+            max(required_total_gain, analog["min"]), analog["max"])
+        new_digital_gain = round(required_total_gain / new_analog_gain, 2)
+        new_digital_gain = min(
+            max(new_digital_gain, digital["min"]), digital["max"])
+
+        if (
+            analog["current"] == new_analog_gain and
+            digital["current"] == new_digital_gain
+        ):
+            self.finish()
+            return
+
+        self.camera_control.set_parameters({
+            "AnalogGain": {"current": new_analog_gain},
+            "DigitalGain": {"current": new_digital_gain}
+        })
+        self.iteration += 1
+        self.adjustment_made = True
+        self.progress.emit(
+            f"Max pixel value {max_pixel_value}, adjusted gains: "
+            f"Analog Gain = {round(new_analog_gain, 2)}, "
+            f"Digital Gain = {new_digital_gain}"
+        )
+        self.begin_measurement(self.verify_frames)
+
+    def finish(self, reason=None):
+        self.active = False
+        message = (
+            f"Final max pixel value {self.max_pixel_value} after "
+            f"{self.iteration} gain adjustments ({self.frames_used} frames)."
+        )
+        if reason:
+            message = f"{reason} {message}"
+        self.progress.emit(message)
+        self.converged.emit(self.max_pixel_value)
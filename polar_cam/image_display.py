@@ -1,30 +1,81 @@
 from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QWidget
-from PySide6.QtGui import QImage, QPainter
-from PySide6.QtCore import QRectF, Slot
+import time
+from PySide6.QtGui import QImage, QPainter, QPixmap
+from PySide6.QtCore import QRectF, Qt, Signal, Slot
 from polar_cam.utils import calculate_image_rect
 
 class Display(QGraphicsView):
+    size_changed = Signal(int, int)
+
     def __init__(self, parent: QWidget = None):
         super().__init__(parent)
         self._scene = CustomGraphicsScene(self)
         self.setScene(self._scene)
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        ratio = self.devicePixelRatioF()
+        self.size_changed.emit(
+            int(self.width() * ratio), int(self.height() * ratio))
+
     @Slot(QImage)
     def on_image_received(self, image: QImage):
         self._scene.set_image(image)
         self.update()
 
+    def paint_statistics(self):
+        return self._scene.paint_statistics()
+
 class CustomGraphicsScene(QGraphicsScene):
     def __init__(self, parent: Display = None):
         super().__init__(parent)
         self._parent = parent
         self._image = QImage()
+        self._pixmap = None
+        self._pixmap_key = None
+        self.paint_counter = 0
+        self.rebuild_counter = 0
+        self.paint_time_total = 0.0
+        self.rebuild_time_total = 0.0
+        self.last_paint_time = 0.0
 
     def set_image(self, image: QImage):
         self._image = image
+        self._pixmap = None
         self.update()
 
+    def scaled_pixmap(self, display_width, display_height):
+        key = (display_width, display_height)
+        if self._pixmap is not None and self._pixmap_key == key:
+            return self._pixmap
+
+        start_time = time.perf_counter()
+        ratio = self._parent.devicePixelRatioF()
+        pixmap = QPixmap.fromImage(self._image.scaled(
+            int(display_width * ratio), int(display_height * ratio),
+            Qt.KeepAspectRatio, Qt.FastTransformation))
+        pixmap.setDevicePixelRatio(ratio)
+        self._pixmap = pixmap
+        self._pixmap_key = key
+        self.rebuild_counter += 1
+        self.rebuild_time_total += time.perf_counter() - start_time
+        return self._pixmap
+
+    def paint_statistics(self):
+        return {
+            'paints': self.paint_counter,
+            'rebuilds': self.rebuild_counter,
+            'mean_paint_ms': (
+                1000 * self.paint_time_total / self.paint_counter
+                if self.paint_counter else 0.0),
+            'mean_rebuild_ms': (
+                1000 * self.rebuild_time_total / self.rebuild_counter
+                if self.rebuild_counter else 0.0),
+            'last_paint_ms': 1000 * self.last_paint_time,
+        }
+
     def drawBackground(self, painter: QPainter, rect: QRectF):
+        start_time = time.perf_counter()
         display_width = self._parent.width()
         display_height = self._parent.height()
         image_width = self._image.width()
@@ -34,5 +85,9 @@ class CustomGraphicsScene(QGraphicsScene):
             display_width, display_height, image_width, image_height)
         if coords is not None:
             image_pos_x, image_pos_y, image_width, image_height = coords
-            rect = QRectF(image_pos_x, image_pos_y, image_width, image_height)
-            painter.drawImage(rect, self._image)
+            pixmap = self.scaled_pixmap(image_width, image_height)
+            painter.drawPixmap(image_pos_x, image_pos_y, pixmap)
+
+        self.last_paint_time = time.perf_counter() - start_time
+        self.paint_time_total += self.last_paint_time
+        self.paint_counter += 1
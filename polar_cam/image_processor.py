@@ -11,6 +11,8 @@ matplotlib.use('Agg')
 import datetime
 from polar_cam.utils import blobs_overlap
 
+POLAR_CHANNELS = ('90', '45', '135', '0')
+
 class ImageProcessor(QObject):
     image_processed = Signal(QImage)
     
@@ -99,24 +101,91 @@ class ImageProcessor(QObject):
 
     def extract_polar_inten(self, image, roi):
         x, y, width, height = roi['x'], roi['y'], roi['width'], roi['height']
+        width -= width % 2
+        height -= height % 2
         roi_image = image[y:y+height, x:x+width]
 
-        sum_intensities = {'90': 0, '45': 0, '135': 0, '0': 0}
-        count_intensities = {'90': 0, '45': 0, '135': 0, '0': 0}
-
-        for i in range(0, height, 2):
-            for j in range(0, width, 2):
-                sum_intensities['90'] += roi_image[i, j]
-                sum_intensities['45'] += roi_image[i, j + 1]
-                sum_intensities['135'] += roi_image[i + 1, j]
-                sum_intensities['0'] += roi_image[i + 1, j + 1]
+        avg_intensities = roi_image.reshape(
+            height // 2, 2, width // 2, 2).mean(axis=(0, 2))
 
-                count_intensities['90'] += 1
-                count_intensities['45'] += 1
-                count_intensities['135'] += 1
-                count_intensities['0'] += 1
+        return dict(zip(POLAR_CHANNELS, avg_intensities.ravel().tolist()))
 
-        avg_intensities = {angle: sum_intensity / count_intensities[angle]
-                           for angle, sum_intensity in sum_intensities.items()}
-
-        return avg_intensities
+    def extract_polar_inten_batch(self, frames, roi):
+        x, y, width, height = roi['x'], roi['y'], roi['width'], roi['height']
+        width -= width % 2
+        height -= height % 2
+        roi_frames = frames[:, y:y+height, x:x+width]
+
+        avg_intensities = roi_frames.reshape(
+            len(frames), height // 2, 2, width // 2, 2).mean(axis=(1, 3))
+
+        return avg_intensities.reshape(len(frames), 4)
+
+    def extract_polar_inten_stack(
+            self, frames, roi, chunk_size=256, crop_index=None):
+        if hasattr(frames, 'image_frames'):
+            frames = frames.image_frames(crop_index)
+        if frames.ndim != 3:
+            raise ValueError(
+                "Expected a stack of frames; pick a crop with crop_index.")
+
+        intensities = np.empty((len(frames), 4))
+        for start in range(0, len(frames), chunk_size):
+            chunk = np.asarray(frames[start:start + chunk_size])
+            intensities[start:start + len(chunk)] = (
+                self.extract_polar_inten_batch(chunk, roi))
+        return intensities
+
+    def detect_spots_in_stack(
+            self, frame_stack, min_sigma, max_sigma, num_sigma, threshold,
+            max_frames=None, crop_index=None):
+        image = frame_stack.mean_image(
+            frame_stack.image_frames(crop_index), max_frames=max_frames)
+        return self.detect_spots(
+            image, min_sigma, max_sigma, num_sigma, threshold)
+
+class MultiSpotExtractor:
+    def __init__(self, rois, frame_shape):
+        self.spot_ids = []
+        self.empty_spot_ids = []
+        self.frame_shape = tuple(frame_shape)
+        frame_height, frame_width = self.frame_shape
+
+        indices = []
+        segments = []
+        for spot_id, roi in rois.items():
+            x = max(roi['x'], 0)
+            y = max(roi['y'], 0)
+            width = max(min(roi['x'] + roi['width'], frame_width) - x, 0)
+            height = max(min(roi['y'] + roi['height'], frame_height) - y, 0)
+            width -= width % 2
+            height -= height % 2
+            if width == 0 or height == 0:
+                self.empty_spot_ids.append(spot_id)
+                continue
+
+            n = len(self.spot_ids)
+            self.spot_ids.append(spot_id)
+            rows, cols = np.mgrid[y:y+height, x:x+width]
+            channels = 2 * ((rows - y) % 2) + (cols - x) % 2
+            indices.append((rows * frame_width + cols).ravel())
+            segments.append((4 * n + channels).ravel())
+
+        indices = np.concatenate(indices) if indices else np.array([], int)
+        segments = np.concatenate(segments) if segments else np.array([], int)
+        order = np.argsort(segments, kind='stable')
+        self.indices = indices[order]
+        counts = np.bincount(segments, minlength=4 * len(self.spot_ids))
+        self.starts = np.cumsum(counts) - counts
+        self.counts = counts
+
+    def extract(self, image):
+        values = image.reshape(-1)[self.indices]
+        sums = np.add.reduceat(values, self.starts, dtype=np.float64)
+        return (sums / self.counts).reshape(len(self.spot_ids), 4)
+
+    def extract_batch(self, frames):
+        values = frames.reshape(len(frames), -1)[:, self.indices]
+        sums = np.add.reduceat(values, self.starts, axis=1, dtype=np.float64)
+        return (sums / self.counts).reshape(
+            len(frames), len(self.spot_ids), 4)
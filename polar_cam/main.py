@@ -2,16 +2,29 @@ from PySide6.QtWidgets import QApplication
 from polar_cam.camera_control import CameraControl
 from polar_cam.image_display import Display
 from polar_cam.image_processor import ImageProcessor
-from polar_cam.data_analyzer import DataAnalyzer
+from polar_cam.data_analyzer import DataAnalyzer, PhaseAnalyzer
 from polar_cam.main_window import MainWindow
+from polar_cam.simulated_camera import SimulatedBackend
+from polar_cam.replay_source import ReplayBackend
 import sys
 
 def main():
     app = QApplication(sys.argv)
-    camera_control = CameraControl()
+    backend = None
+    if "--simulate" in sys.argv:
+        backend = SimulatedBackend()
+    elif "--replay" in sys.argv:
+        index = sys.argv.index("--replay") + 1
+        if index >= len(sys.argv):
+            print("Usage: polarcam --replay RECORDING [--fast]")
+            return
+        backend = ReplayBackend(
+            sys.argv[index], realtime="--fast" not in sys.argv)
+    camera_control = CameraControl(backend)
     display = Display()
     image_processor = ImageProcessor(display)
-    data_analyzer = DataAnalyzer()
+    data_analyzer = (
+        PhaseAnalyzer() if "--phase" in sys.argv else DataAnalyzer())
     main_window = MainWindow(camera_control, image_processor, data_analyzer)
     main_window.show()
     camera_control.initialize_and_start_acquisition()
@@ -1,17 +1,27 @@
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QPushButton, QLabel, QLineEdit,
     QHBoxLayout, QDockWidget, QFormLayout, QGroupBox, QMessageBox,
-    QStatusBar, QFileDialog, QScrollArea, QApplication, QInputDialog
+    QStatusBar, QFileDialog, QScrollArea, QApplication, QInputDialog,
+    QCheckBox
 )
 from PySide6.QtCore import Qt, QTimer, Slot
 import cv2
 import os
-import numpy as np
 import time
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
+from polar_cam.analysis_runner import AnalysisRunner, default_worker_count
+from polar_cam.gain_controller import AutoGainController
 from polar_cam.image_display import Display
+from polar_cam.image_processor import MultiSpotExtractor
+from polar_cam.roi_planner import FrameRateModel, RoiPlanner
+from polar_cam.spot_cache import SpotSettingsCache
+from polar_cam.speed_monitor import SpeedMonitor
+from polar_cam.spot_data import SpotRecorder
 from polar_cam.utils import adjust_for_increment, adjust_rectangle
+from polar_cam.frame_stack import FrameStackWriter
+from polar_cam.video_writer import AviFrameSink, VideoWriter
+from polar_cam.visit_scheduler import VisitScheduler
 
 class MainWindow(QMainWindow):
     def __init__(self, camera_control, image_processor, data_analyzer):
@@ -21,19 +31,33 @@ class MainWindow(QMainWindow):
         self.data_analyzer = data_analyzer
 
         self.is_recording = False
+        self.is_video_recording = False
         self.spots = []
         self.blobs = []
-        self.recorded_frames = []
+        self.video_writer = None
+        self.live_speed_spot = None
         self.spots_to_process = []
-        self.spot_timestamps_storage = {}
-        self.spot_intensities_storage = {}
+        self.spot_recorder = None
+        self.spot_visits_storage = {}
+        self.spot_drop_storage = {}
+        self.analysis_runners = []
+        self.last_recorded_frame_id = None
         self.spot_image = None
         self.start_time = None
         self.original_settings = None
-        self.current_spot_id = None
+        self.current_spot_ids = []
         self.data_directory = None
         self.sample_counter = 1
-        self.current_roi = None
+        self.multi_spot_extractor = None
+        self.current_band = None
+        self.current_visit = None
+        self.configured_band = None
+        self.visit_scheduler = None
+        self.visit_start_time = None
+        self.framerate_model = FrameRateModel()
+        self.gain_controller = AutoGainController(camera_control)
+        self.speed_monitor = SpeedMonitor(data_analyzer)
+        self.spot_cache = None
 
         self.init_camera_parameters()
         self.setup_ui()
@@ -162,6 +186,7 @@ class MainWindow(QMainWindow):
         self.create_roi_offset_group(sidebar_layout)
         self.create_gain_group(sidebar_layout)
         self.create_spot_detection_group(sidebar_layout)
+        self.create_live_speed_group(sidebar_layout)
 
         self.addDockWidget(Qt.LeftDockWidgetArea, self.parameter_sidebar)
 
@@ -190,51 +215,105 @@ class MainWindow(QMainWindow):
                 self.start_pause_button.setText("Pause Acquisition")
 
     def toggle_recording(self):
-        if self.is_recording:
-            self.is_recording = False
+        if self.is_video_recording:
+            self.is_video_recording = False
             self.record_button.setText("Start Recording")
-            self.save_recording()
+            self.finish_recording()
         else:
+            if self.video_writer is not None:
+                QMessageBox.information(
+                    self, "Info", "The previous recording is still saving.")
+                return
+            if self.spot_recorder is not None:
+                QMessageBox.information(
+                    self, "Info",
+                    "Video recording is unavailable during a spot scan.")
+                return
+
+            filepath, selected_filter = QFileDialog.getSaveFileName(
+                self, "Save Video", "",
+                "Video Files (*.avi);;Raw Frame Stack (*.npy);;"
+                "Raw Spot Crops (*.npy)")
+            if not filepath:
+                return
+
+            if selected_filter.startswith("Raw Spot"):
+                if not self.spots:
+                    QMessageBox.warning(
+                        self, "Warning", "Detect spots before recording crops.")
+                    return
+                sink = FrameStackWriter(filepath, crops=self.spots)
+            elif selected_filter.startswith("Raw") or filepath.endswith('.npy'):
+                sink = FrameStackWriter(filepath)
+            else:
+                sink = AviFrameSink(filepath, round(self.current_framerate, 2))
+
+            self.video_writer = VideoWriter(sink)
+            self.video_writer.finished.connect(self.on_recording_saved)
+            self.video_writer.failed.connect(self.on_recording_failed)
+            self.video_writer.start()
+
             if not self.camera_control.acquisition_running:
                 self.toggle_acquisition()
-            self.is_recording = True
+            self.is_video_recording = True
             self.record_button.setText("Stop Recording")
-            self.recorded_frames = []
 
-    def save_recording(self):
-        filepath, _ = QFileDialog.getSaveFileName(
-            self, "Save Video", "", "Video Files (*.avi)")
-        if not filepath:
-            return
-                    
-        height, width = self.recorded_frames[0].shape[:2]
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        fps = round(self.current_framerate, 2)
-        
-        video = cv2.VideoWriter(
-            filepath, fourcc, fps, (width, height), isColor=False)
+    def finish_recording(self):
+        self.video_writer.close()
+        statistics = self.video_writer.statistics()
+        self.status_bar.showMessage(
+            f"Saving recording: {statistics['queued']} frames left to write.")
 
-        for _, frame in enumerate(self.recorded_frames):            
-            video.write(frame)
-        
-        video.release()
+    @Slot(str)
+    def on_recording_failed(self, error_message):
+        if self.is_video_recording:
+            self.is_video_recording = False
+            self.record_button.setText("Start Recording")
+        QMessageBox.warning(
+            self, "Recording Stopped",
+            f"The recording was stopped early.\n{error_message}")
 
-    def on_frame_captured(self, image_np_array):
-        if self.is_recording and self.current_spot_id is None:
-            self.recorded_frames.append(np.copy(image_np_array))
-            
-        if self.is_recording and self.current_spot_id is not None:
-            elapsed_time = time.perf_counter() - self.start_time
+    @Slot()
+    def on_recording_saved(self):
+        statistics = self.video_writer.statistics()
+        self.video_writer = None
+        self.status_bar.showMessage(
+            f"Recording saved: {statistics['written']} frames written, "
+            f"{statistics['dropped']} dropped, {statistics['errors']} "
+            f"errors, max queue depth {statistics['max_queue_depth']}, "
+            f"{statistics['mean_write_ms']:.2f} ms per frame."
+        )
+
+    def on_frame_captured(self, image_np_array, frame_id, timestamp):
+        if self.is_video_recording:
+            self.video_writer.submit(image_np_array, frame_id, timestamp)
+
+        if self.is_recording and self.current_spot_ids:
+            if (
+                self.multi_spot_extractor is None or
+                image_np_array.shape != self.multi_spot_extractor.frame_shape
+            ):
+                return
 
-            self.spot_timestamps_storage.setdefault(
-                self.current_spot_id, []).append(elapsed_time)
+            if self.start_time is None:
+                self.start_time = timestamp
+            elapsed_time = timestamp - self.start_time
+
+            dropped = 0
+            if (
+                self.last_recorded_frame_id is not None and
+                frame_id > self.last_recorded_frame_id + 1
+            ):
+                dropped = frame_id - self.last_recorded_frame_id - 1
+            self.last_recorded_frame_id = frame_id
 
-            extracted = self.image_processor.extract_polar_inten(
-                image_np_array, self.current_roi)
-            for key in self.spot_intensities_storage[
-                self.current_spot_id].keys():
-                self.spot_intensities_storage[
-                    self.current_spot_id][key].append(extracted[key])
+            intensities = self.multi_spot_extractor.extract(image_np_array)
+            self.spot_recorder.append(elapsed_time, frame_id, intensities)
+            self.speed_monitor.append(elapsed_time, intensities)
+            if dropped:
+                for spot_id in self.multi_spot_extractor.spot_ids:
+                    self.spot_drop_storage[spot_id]['gaps'] += 1
+                    self.spot_drop_storage[spot_id]['dropped'] += dropped
 
     def create_framerate_group(self, layout):
         self.framerate_group = QGroupBox("AcquisitionFrameRate")
@@ -360,6 +439,13 @@ class MainWindow(QMainWindow):
         self.max_sigma_input = QLineEdit("30")
         self.num_sigma_input = QLineEdit("10")
         self.threshold_input = QLineEdit("0.3")
+        self.simultaneous_scan_checkbox = QCheckBox(
+            "Record all spots in one pass")
+        self.equal_samples_checkbox = QCheckBox(
+            "Equal samples per spot (adjust band durations)")
+        self.plot_results_checkbox = QCheckBox("Plot speed traces")
+        self.plot_results_checkbox.setChecked(True)
+        self.analysis_workers_input = QLineEdit(str(default_worker_count()))
         self.reset_spot_detection_button = QPushButton("Reset to Defaults")
         self.reset_spot_detection_button.clicked.connect(
             self.reset_spot_detection_parameters)
@@ -368,11 +454,64 @@ class MainWindow(QMainWindow):
         form_layout.addRow("Max Sigma", self.max_sigma_input)
         form_layout.addRow("Number Sigma", self.num_sigma_input)
         form_layout.addRow("Threshold", self.threshold_input)
+        form_layout.addRow(self.simultaneous_scan_checkbox)
+        form_layout.addRow(self.equal_samples_checkbox)
+        form_layout.addRow(self.plot_results_checkbox)
+        form_layout.addRow("Analysis Workers", self.analysis_workers_input)
         form_layout.addRow(self.reset_spot_detection_button)
 
         self.spot_detection_group.setLayout(form_layout)
         layout.addWidget(self.spot_detection_group)
 
+    def create_live_speed_group(self, layout):
+        self.live_speed_group = QGroupBox("Live Rotation Speed")
+        live_layout = QVBoxLayout()
+
+        self.live_speed_label = QLabel("No spot recording.")
+        self.live_speed_label.setWordWrap(True)
+        self.live_speed_figure = Figure(figsize=(4, 3))
+        self.live_speed_canvas = FigureCanvasQTAgg(self.live_speed_figure)
+        self.live_speed_canvas.setMinimumHeight(200)
+        self.live_speed_ax = self.live_speed_figure.add_subplot(111)
+        self.live_speed_timer = QTimer(self)
+        self.live_speed_timer.setSingleShot(True)
+        self.live_speed_timer.timeout.connect(self.draw_live_speed)
+
+        live_layout.addWidget(self.live_speed_label)
+        live_layout.addWidget(self.live_speed_canvas)
+
+        self.live_speed_group.setLayout(live_layout)
+        layout.addWidget(self.live_speed_group)
+
+    @Slot(dict)
+    def on_speed_updated(self, update):
+        lines = []
+        for spot_id in update['spot_ids']:
+            speeds = ", ".join(
+                f"{label} {update['speeds'][label][spot_id]:.1f}"
+                for label in update['speeds'])
+            lines.append(f"Spot {spot_id}: {speeds} Hz")
+        self.live_speed_label.setText(
+            f"t = {update['time']:.1f} s\n" + "\n".join(lines))
+
+        if update['spot_ids']:
+            self.live_speed_spot = update['spot_ids'][0]
+            if not self.live_speed_timer.isActive():
+                self.live_speed_timer.start(500)
+
+    def draw_live_speed(self):
+        self.live_speed_ax.clear()
+        for label in self.speed_monitor.traces.get(self.live_speed_spot, {}):
+            times, frequencies = self.speed_monitor.trace(
+                self.live_speed_spot, label)
+            self.live_speed_ax.plot(times, frequencies, label=label)
+        self.live_speed_ax.set_title(f"Spot {self.live_speed_spot}")
+        self.live_speed_ax.set_xlabel("Time (s)")
+        self.live_speed_ax.set_ylabel("Frequency (Hz)")
+        self.live_speed_ax.legend(fontsize='small')
+        self.live_speed_figure.tight_layout()
+        self.live_speed_canvas.draw_idle()
+
     def on_apply_framerate(self):
         try:
             input_framerate = float(self.framerate_input.text())
@@ -710,42 +849,131 @@ class MainWindow(QMainWindow):
                 "No spots detected or spot detection not yet performed.")
             return
 
+        if self.video_writer is not None:
+            QMessageBox.warning(
+                self, "Warning",
+                "Stop the video recording before scanning spots.")
+            return
+
         if not self.camera_control.acquisition_running:
             self.toggle_acquisition()
 
         self.original_settings = self.save_original_camera_settings()
-        self.spots_to_process = self.spots.copy()
         self.sample_folder = os.path.join(
             self.data_directory, f"Sample {self.sample_counter}")
         os.makedirs(self.sample_folder, exist_ok=True)
+        self.spot_cache = SpotSettingsCache(
+            os.path.join(self.data_directory, "spot_settings_cache.json"))
 
         duration_seconds, ok = QInputDialog.getInt(
             self, "Scan Duration", "Enter the scan duration in seconds:", 
             value=10, minValue=1, maxValue=6000, step=1
         )
 
+        if not ok:
+            QMessageBox.information(self, "Info", "Spot scanning canceled.")
+            return
+
+        rounds, ok = QInputDialog.getInt(
+            self, "Scan Rounds", "Enter the number of rounds over all spots:",
+            value=1, minValue=1, maxValue=1000, step=1
+        )
+
         if ok:
-            self.scan_duration = duration_seconds * 1000
+            bands = self.plan_spot_bands(duration_seconds)
+            if bands is None:
+                QMessageBox.information(
+                    self, "Info", "Spot scanning canceled.")
+                return
+            self.visit_scheduler = VisitScheduler(bands, rounds)
+            self.spots_to_process = self.visit_scheduler.visits.copy()
+            for spot in self.spots:
+                self.spot_visits_storage[spot['id']] = []
+                self.spot_drop_storage[spot['id']] = {'gaps': 0, 'dropped': 0}
+            self.spot_recorder = SpotRecorder(self.sample_folder)
+            self.spot_recorder.failed.connect(self.on_spot_recording_failed)
+            self.speed_monitor.reset()
+            self.start_time = None
+            self.visit_scheduler.start()
             self.process_next_spot()
         else:
             QMessageBox.information(self, "Info", "Spot scanning canceled.")
 
+    def plan_spot_bands(self, duration_seconds):
+        sensor_spots = [
+            dict(
+                spot,
+                x=spot['x'] + self.original_settings['roi_x'],
+                y=spot['y'] + self.original_settings['roi_y']
+            )
+            for spot in self.spots
+        ]
+        planner = RoiPlanner(
+            self.current_w + self.max_x, self.current_h + self.max_y,
+            self.framerate_model,
+            equal_samples=self.equal_samples_checkbox.isChecked()
+        )
+
+        if self.simultaneous_scan_checkbox.isChecked():
+            bands = planner.single_band_plan(sensor_spots, duration_seconds)
+        else:
+            bands = planner.plan(sensor_spots, duration_seconds)
+
+        if any(band['duration'] != duration_seconds for band in bands):
+            durations = "\n".join(
+                f"Spots {[spot['id'] for spot in band['spots']]}: "
+                f"{band['duration']:.1f} s at {band['framerate']:.0f} fps"
+                for band in bands)
+            reply = QMessageBox.question(
+                self, "Adjusted Durations",
+                f"Band durations adjusted for equal samples per spot:\n"
+                f"{durations}\n\nStart the scan?",
+                QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return None
+
+        self.status_bar.showMessage(
+            f"Scanning {len(sensor_spots)} spots in {len(bands)} bands, "
+            f"estimated {round(planner.estimate_scan_time(bands))} s."
+        )
+        return bands
+
     def process_next_spot(self):
         if self.spots_to_process:
-            spot = self.spots_to_process.pop(0)
-            print(f"Processing spot: {spot}")
+            visit = self.spots_to_process.pop(0)
+            print(
+                f"Processing spots: {[s['id'] for s in visit['band']['spots']]}"
+                f" (round {visit['round'] + 1})"
+            )
             QTimer.singleShot(
-                100, lambda: self.start_spot_recording(spot['id'])
+                100, lambda: self.start_spot_recording(visit)
             )
         else:
+            duty_cycle = self.visit_scheduler.duty_cycle()
+            self.spot_recorder.close()
+            last_error = self.spot_recorder.last_error
             self.restore_camera_settings(self.original_settings)
             self.analyze_all_spot_data()
             self.sample_counter += 1
             self.spots_to_process = []
-            self.spot_timestamps_storage = {}
-            self.spot_intensities_storage = {}
-            self.current_roi = None
-            QMessageBox.information(self, "Info", "Spot scanning completed.")
+            self.spot_recorder = None
+            self.spot_visits_storage = {}
+            self.spot_drop_storage = {}
+            self.multi_spot_extractor = None
+            self.current_band = None
+            self.current_visit = None
+            self.configured_band = None
+            if last_error is None:
+                QMessageBox.information(
+                    self, "Info",
+                    f"Spot scanning completed. Duty cycle: {duty_cycle:.0%}.")
+
+    @Slot(str)
+    def on_spot_recording_failed(self, error_message):
+        self.spots_to_process = []
+        QMessageBox.warning(
+            self, "Spot Scan Stopped",
+            f"The spot scan stops after the current band.\n{error_message}")
 
     def save_original_camera_settings(self):
         original_settings = {}
@@ -763,233 +991,185 @@ class MainWindow(QMainWindow):
 
         return original_settings
 
-    def adjust_camera_to_spot(self, spot):
-        FULL_FRAME_WIDTH = 2464
-        FULL_FRAME_HEIGHT = 2056
-        MIN_ROI_WIDTH = 256
-        MIN_ROI_HEIGHT = 2
-        STEP_INCREMENT_X = 4
-        STEP_INCREMENT_Y = 2
-
-        desired_width = max(MIN_ROI_WIDTH, spot['width'])
-        desired_height = max(MIN_ROI_HEIGHT, spot['height'])
-        desired_width = (
-            ((desired_width + STEP_INCREMENT_X - 1) // STEP_INCREMENT_X) 
-            * STEP_INCREMENT_X
-        )
-        desired_height = (
-            ((desired_height + STEP_INCREMENT_Y - 1) // STEP_INCREMENT_Y)
-            * STEP_INCREMENT_Y
-        )
-        desired_width = min(desired_width, FULL_FRAME_WIDTH)
-        desired_height = min(desired_height, FULL_FRAME_HEIGHT)
-
-        offset_x = max(
-            0, 
-            spot['x'] + self.original_settings['roi_x'] - 
-            (desired_width - spot['width']) // 2
-        )
-        offset_y = max(
-            0, 
-            spot['y'] + self.original_settings['roi_y'] - 
-            (desired_height - spot['height']) // 2
-        )
-        offset_x -= offset_x % STEP_INCREMENT_X
-        offset_y -= offset_y % STEP_INCREMENT_Y
-        offset_x = min(offset_x, FULL_FRAME_WIDTH - desired_width)
-        offset_y = min(offset_y, FULL_FRAME_HEIGHT - desired_height)
-
-        self.camera_control.set_parameters({
-            "OffsetX": {"current": self.min_x},
-            "OffsetY": {"current": self.min_y}
-        })
+    def adjust_camera_to_band(self, band):
+        roi = band['roi']
         self.camera_control.set_parameters({
-            "Width": {"current": self.min_w},
-            "Height": {"current": self.min_h}
+            "OffsetX": {"current": roi['x']},
+            "OffsetY": {"current": roi['y']},
+            "Width": {"current": roi['width']},
+            "Height": {"current": roi['height']},
+            "ExposureTime": {"current": "min"},
+            "AcquisitionFrameRate": {"current": "max"}
         })
 
-        self.camera_control.set_parameters({
-            "Width": {"current": desired_width}, 
-            "Height": {"current": desired_height}
-        })
-        
-        self.camera_control.set_parameters({
-            "OffsetX": {"current": offset_x},
-            "OffsetY": {"current": offset_y}
-        })
-
-    def minimize_exposure(self):
-        self.camera_control.set_parameters({
-            "ExposureTime": {"current": self.min_exposure * 1000}})
-
-    def maximize_framerate(self):
-        self.camera_control.set_parameters({
-            "AcquisitionFrameRate": {"current": self.max_framerate}})
-
-    def adjust_gain_to_target(self, max_pixel_value, target_value=150):
-        if max_pixel_value == 0:
+    @Slot(int)
+    def on_gain_converged(self, max_pixel_value):
+        if not self.current_spot_ids:
             return
 
-        adjustment_made = False
-
-        while True:
-            current_analog_gain = self.current_analog_gain
-            current_digital_gain = self.current_digital_gain
-            print(
-                "Current gains: "
-                f"Analog Gain = {round(current_analog_gain, 2)}, "
-                f"Digital Gain = {round(current_digital_gain, 2)}"
-            )
-            current_total_gain = current_analog_gain * current_digital_gain
-            required_total_gain = round(
-                (target_value / max_pixel_value) * current_total_gain, 2)
+        self.spot_cache.store_band(
+            self.current_band, self.camera_control.parameters,
+            max_pixel_value)
+        self.configured_band = self.current_band
+        self.begin_visit_recording()
+
+    def begin_visit_recording(self):
+        self.current_spot_ids = list(self.multi_spot_extractor.spot_ids)
+        self.spot_recorder.start_band(self.multi_spot_extractor.spot_ids)
+        self.speed_monitor.start_band(self.multi_spot_extractor.spot_ids)
+        for spot_id in self.current_spot_ids:
+            self.spot_visits_storage[spot_id].append(
+                [self.spot_recorder.row_count(spot_id), None])
+
+        self.visit_start_time = time.perf_counter()
+        self.last_recorded_frame_id = None
+        self.is_recording = True
+        spot_ids = self.current_spot_ids
+        QTimer.singleShot(
+            int(self.current_band['duration'] * 1000), 
+            lambda: self.stop_spot_recording(spot_ids))
 
-            new_analog_gain = min(
-                max(required_total_gain, self.min_analog_gain), 
-                self.max_analog_gain
-            )
-            new_digital_gain = round(required_total_gain / new_analog_gain, 2)
-            new_digital_gain = min(
-                max(new_digital_gain, self.min_digital_gain), 
-                self.max_digital_gain
-            )
+    def start_spot_recording(self, visit):
+        if self.current_spot_ids:
+            return
 
-            if (
-                current_analog_gain == new_analog_gain 
-                and current_digital_gain == new_digital_gain
-            ):
-                break
+        band = visit['band']
+        spot_ids = [spot['id'] for spot in band['spots']]
+        self.current_spot_ids = spot_ids
+        self.current_band = band
+        self.current_visit = visit
 
-            self.camera_control.set_parameters({
-                "AnalogGain": {"current": new_analog_gain},
-                "DigitalGain": {"current": new_digital_gain}
-            })
+        if not visit['reconfigure'] and self.configured_band is band:
+            self.begin_visit_recording()
+            return
 
-            time.sleep(0.5)
-            
-            print(
-                f"Adjusted gains: Analog Gain = {round(new_analog_gain, 2)}, "
-                f"Digital Gain = {new_digital_gain}"
+        self.configured_band = None
+        if band['spots']:
+            self.adjust_camera_to_band(band)
+            self.status_bar.showMessage(
+                f"Switched to spots {spot_ids} in "
+                f"{round(self.camera_control.last_switch_time * 1000)} ms."
             )
-
-            frame = self.camera_control.get_current_frame()
-            max_pixel_value = np.max(frame)
-            print(f"New max pixel value after adjustment: {max_pixel_value}")
-
-            adjustment_made = True
-
-            if max_pixel_value <= 220:
-                break
-
-            if (
-                new_analog_gain <= self.min_analog_gain 
-                and new_digital_gain <= self.min_digital_gain 
-                and max_pixel_value < target_value
-            ):
-                print(
-                    "Both gains are at their minimum values and intensity is "
-                    "below target. Exiting adjustment loop."
-                )
-                break
-
-            if (
-                new_analog_gain >= self.max_analog_gain 
-                and new_digital_gain >= self.max_digital_gain 
-                and max_pixel_value > target_value
-            ):
+            self.framerate_model.add_observation(
+                self.current_h, self.max_framerate)
+
+            rois = {}
+            for spot in band['spots']:
+                calculated_x = spot['x'] - self.current_x
+                calculated_y = spot['y'] - self.current_y
+                rois[spot['id']] = {
+                    'x': calculated_x,
+                    'y': calculated_y,
+                    'width': spot['width'],
+                    'height': spot['height']
+                }
+            self.multi_spot_extractor = MultiSpotExtractor(
+                rois, (self.current_h, self.current_w))
+            if self.multi_spot_extractor.empty_spot_ids:
                 print(
-                    "Both gains are at their maximum values and intensity is "
-                    "above target. Exiting adjustment loop."
+                    f"Spots {self.multi_spot_extractor.empty_spot_ids} lie "
+                    f"outside the camera ROI and are skipped.")
+
+            cached = self.spot_cache.lookup_band(band)
+            if cached is not None:
+                self.camera_control.set_parameters({
+                    "ExposureTime": {"current": cached['exposure']},
+                    "AnalogGain": {"current": cached['analog_gain']},
+                    "DigitalGain": {"current": cached['digital_gain']}
+                })
+                self.gain_controller.verify(
+                    cached['max_pixel_value'],
+                    self.spot_cache.intensity_tolerance,
+                    target_value=150
                 )
-                break
-
-        if not adjustment_made:
-            print(f"Max pixel value already optimal: {max_pixel_value}")
-        print(f"Final max pixel value after adjustments: {max_pixel_value}")
-
-    def scan_roi_and_adjust_gain(self, num_frames=10, target_value=150):
-        max_pixel_value = 0
-
-        for _ in range(num_frames):
-            frame = self.camera_control.get_current_frame()
-            max_pixel_value = max(max_pixel_value, np.max(frame))
-            time.sleep(0.1)
-
-        print(f"Max pixel value after {num_frames} frames: {max_pixel_value}")
-
-        self.adjust_gain_to_target(max_pixel_value, target_value)
-        
-        self.start_time = time.perf_counter()
-        self.is_recording = True
-        QTimer.singleShot(
-            self.scan_duration, 
-            lambda: self.stop_spot_recording(self.current_spot_id))
-
-    def start_spot_recording(self, spot_id):
-        if self.current_spot_id is not None:
-            return
-
-        self.current_spot_id = spot_id
-        self.spot_timestamps_storage[spot_id] = []
-        self.spot_intensities_storage[spot_id] = {
-            '90': [], '45': [], '135': [], '0': []}
-
-        spot = next((s for s in self.spots if s['id'] == spot_id), None)
-        if spot:
-            self.adjust_camera_to_spot(spot)
-            self.minimize_exposure()
-            self.maximize_framerate()
-
-            calculated_x = spot['x'] + self.original_settings[
-                'roi_x'] - self.current_x
-            calculated_y = spot['y'] + self.original_settings[
-                'roi_y'] - self.current_y
-            self.current_roi = {
-                'x': calculated_x,
-                'y': calculated_y,
-                'width': spot['width'],
-                'height': spot['height']
-            }
-
-        QTimer.singleShot(1000, self.scan_roi_and_adjust_gain)
-
-    def stop_spot_recording(self, spot_id):
-        if self.current_spot_id == spot_id:
-            spot = next((s for s in self.spots if s['id'] == spot_id), None)
-            if not spot:
-                print(f"Spot {spot_id} not found.")
                 return
-            
-            timestamps = self.spot_timestamps_storage.get(spot_id, [])
-            intensities = self.spot_intensities_storage.get(spot_id, {})
 
-            self.save_spot_data(spot_id, intensities, timestamps)
+        self.gain_controller.start(target_value=150)
 
-            self.current_spot_id = None
+    def stop_spot_recording(self, spot_ids):
+        if self.current_spot_ids == spot_ids:
             self.is_recording = False
+            self.visit_scheduler.add_recorded_time(
+                time.perf_counter() - self.visit_start_time)
+            self.spot_recorder.submit()
+
+            for spot_id in spot_ids:
+                visits = self.spot_visits_storage.get(spot_id, [])
+                if visits:
+                    visits[-1][1] = self.spot_recorder.row_count(spot_id)
+
+                if not self.current_visit['final']:
+                    continue
+
+                spot = next(
+                    (s for s in self.spots if s['id'] == spot_id), None)
+                if not spot:
+                    print(f"Spot {spot_id} not found.")
+                    continue
+
+                drops = self.spot_drop_storage.get(
+                    spot_id, {'gaps': 0, 'dropped': 0})
+                sensor_spot = next(
+                    s for s in self.current_band['spots']
+                    if s['id'] == spot_id)
+                parameters = self.camera_control.parameters
+                self.spot_recorder.finish_spot(spot_id, {
+                    'spot': {
+                        key: sensor_spot[key]
+                        for key in ['x', 'y', 'width', 'height']
+                    },
+                    'roi': self.current_band['roi'],
+                    'framerate': parameters["AcquisitionFrameRate"]["current"],
+                    'exposure': parameters["ExposureTime"]["current"],
+                    'analog_gain': parameters["AnalogGain"]["current"],
+                    'digital_gain': parameters["DigitalGain"]["current"],
+                    'visits': visits,
+                    'dropped_frames': drops['dropped'],
+                    'frame_gaps': drops['gaps'],
+                })
+
+            dropped = max(
+                (self.spot_drop_storage[spot_id]['dropped']
+                 for spot_id in spot_ids), default=0)
+            self.status_bar.showMessage(
+                f"Dropped frames: {dropped}, duty cycle: "
+                f"{self.visit_scheduler.duty_cycle():.0%}, "
+                f"{round(self.visit_scheduler.recorded_time)} s recorded in "
+                f"{round(self.visit_scheduler.wall_time())} s."
+            )
+            self.current_spot_ids = []
             self.process_next_spot()
 
-    def save_spot_data(self, spot_id, intensities, timestamps):
-        raw_data_file = os.path.join(
-            self.sample_folder, f"spot_{spot_id}_data.npz")
-        
-        np.savez_compressed(
-            raw_data_file, intensities=intensities, timestamps=timestamps)
-
     def analyze_all_spot_data(self):
-        for file in os.listdir(self.sample_folder):
-            if file.endswith('_data.npz'):
-                raw_data_file = os.path.join(self.sample_folder, file)
-                data = np.load(raw_data_file, allow_pickle=True)
-                intensities = data['intensities'].item()
-                timestamps = data['timestamps']
-                spot_id = int(file.split('_')[1])
-
-                self.data_analyzer.analyze(
-                    intensities, timestamps, spot_id, self.sample_folder)
-        
-        print("All data analyzed.")
-        QMessageBox.information(self, "Info", "All data analyzed.")
+        try:
+            workers = max(1, int(self.analysis_workers_input.text()))
+        except ValueError:
+            workers = default_worker_count()
+            self.analysis_workers_input.setText(str(workers))
+
+        runner = AnalysisRunner(
+            self.data_analyzer, self.sample_folder, workers,
+            plot=self.plot_results_checkbox.isChecked())
+        runner.progress.connect(self.on_analysis_progress)
+        runner.completed.connect(self.on_analysis_completed)
+        runner.finished.connect(lambda: self.analysis_runners.remove(runner))
+        self.analysis_runners.append(runner)
+        runner.start()
+
+    @Slot(int, int, str)
+    def on_analysis_progress(self, done, total, spot):
+        self.status_bar.showMessage(
+            f"Analyzing spots: {done}/{total}" + (f" ({spot})" if spot else ""))
+
+    @Slot(dict)
+    def on_analysis_completed(self, summary):
+        failed = (
+            f", {len(summary['errors'])} failed" if summary['errors'] else "")
+        self.status_bar.showMessage(
+            f"Analysis of {os.path.basename(summary['folder'])} completed: "
+            f"{len(summary['spots'])} spots{failed} in "
+            f"{summary['elapsed']:.1f} s, summary saved to "
+            f"analysis_summary.json.")
 
     def restore_camera_settings(self, settings):
         required_keys = [
@@ -1003,41 +1183,26 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            self.camera_control.set_parameters({
-                "OffsetX": {"current": self.min_x},
-                "OffsetY": {"current": self.min_y}
-            })
-            self.camera_control.set_parameters({
-                "Width": {"current": self.min_w},
-                "Height": {"current": self.min_h}
-            })
-            
             self.camera_control.set_parameters({
                 "OffsetX": {"current": settings['roi_x']},
-                "OffsetY": {"current": settings['roi_y']}
-            })            
-            self.camera_control.set_parameters({
+                "OffsetY": {"current": settings['roi_y']},
                 "Width": {"current": settings['roi_width']}, 
-                "Height": {"current": settings['roi_height']}
-            })
-        
-            self.camera_control.set_parameters({
-                "ExposureTime": {
-                    "current": settings['exposure'] * 1000
-                }
-            })
-            self.camera_control.set_parameters({
-                "AcquisitionFrameRate": {
-                    "current": settings['framerate']
-                }
+                "Height": {"current": settings['roi_height']},
+                "ExposureTime": {"current": settings['exposure'] * 1000},
+                "AcquisitionFrameRate": {"current": settings['framerate']}
             })
         except ValueError as e:
             QMessageBox.critical(
                 self, "Error", f"Failed to restore camera settings: {e}")
 
     def connect_signals(self):
+        self.speed_monitor.speed_updated.connect(self.on_speed_updated)
         self.camera_control.image_acquired.connect(
             self.image_display.on_image_received)
+        self.image_display.size_changed.connect(
+            self.camera_control.preview.set_target_size)
+        self.camera_control.preview.set_target_size(
+            self.image_display.width(), self.image_display.height())
         self.camera_control.parameter_updated.connect(
             self.on_parameter_updated)
         self.camera_control.acquisition_updated.connect(
@@ -1048,6 +1213,10 @@ class MainWindow(QMainWindow):
         self.camera_control.acquisition_stopped.connect(
             self.on_acquisition_stopped)
         self.camera_control.frame_captured.connect(self.on_frame_captured)
+        self.camera_control.frame_captured.connect(
+            self.gain_controller.on_frame)
+        self.gain_controller.progress.connect(self.status_bar.showMessage)
+        self.gain_controller.converged.connect(self.on_gain_converged)
         self.image_processor.image_processed.connect(
             self.image_display.on_image_received)
 
@@ -1146,11 +1315,17 @@ class MainWindow(QMainWindow):
                 QMessageBox.Ok
             )
 
-    @Slot(int, int)
-    def on_acquisition_updated(self, frame_counter, error_counter):
+    @Slot(int, int, int)
+    def on_acquisition_updated(
+            self, frame_counter, dropped_counter, error_counter):
         fps = round(self.current_framerate, 2)
+        buffers = self.camera_control.buffer_statistics()
         self.label_infos.setText(
-            f"Acquired: {frame_counter}, Errors: {error_counter}, fps: {fps}")
+            f"Acquired: {frame_counter}, Dropped: {dropped_counter}, "
+            f"Errors: {error_counter}, fps: {fps}, "
+            f"Throughput: {self.camera_control.throughput():.1f} fps, "
+            f"Buffers: {buffers['max_occupancy']}/{buffers['buffers']}, "
+            f"Underruns: {buffers['underruns']}")
 
     @Slot(str)
     def on_camera_error(self, error_message):
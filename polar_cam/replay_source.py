@@ -0,0 +1,252 @@
+import os
+import cv2
+import numpy as np
+from polar_cam.camera_backend import CameraBackend, CameraBackendError
+from polar_cam.frame_stack import FrameStack
+from polar_cam.simulated_camera import SimulatedDataStream, SimulatedNodeMap
+
+class FrameStackSource:
+    def __init__(self, path, framerate=None):
+        self.stack = FrameStack(path)
+        if self.stack.frames.ndim != 3:
+            raise CameraBackendError(
+                f"{path} holds spot crops; only full frame stacks can be "
+                f"replayed.")
+
+        timestamps = np.asarray(self.stack.timestamps, dtype=np.float64)
+        if len(timestamps) > 1 and np.all(np.diff(timestamps) > 0):
+            self.framerate = framerate or 1 / np.median(np.diff(timestamps))
+            self.timestamps = timestamps
+        else:
+            self.framerate = framerate or 30.0
+            self.timestamps = (
+                np.arange(1, len(self.stack) + 1) / self.framerate)
+
+    def __len__(self):
+        return len(self.stack)
+
+    @property
+    def frame_shape(self):
+        return self.stack.frames.shape[1:]
+
+    def frame(self, index):
+        return self.stack.frames[index]
+
+    def close(self):
+        self.stack = None
+
+class AviSource:
+    def __init__(self, path, framerate=None):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise CameraBackendError(f"Could not open {path}.")
+
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.framerate = (
+            framerate or self.capture.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.timestamps = np.arange(1, self.frame_count + 1) / self.framerate
+        self.next_index = 0
+        self.shape = (
+            int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)))
+
+    def __len__(self):
+        return self.frame_count
+
+    @property
+    def frame_shape(self):
+        return self.shape
+
+    def frame(self, index):
+        if index != self.next_index:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        success, frame = self.capture.read()
+        if not success:
+            raise CameraBackendError(
+                f"Could not read frame {index} from {self.path}.")
+        self.next_index = index + 1
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def close(self):
+        self.capture.release()
+
+def open_replay_source(path, framerate=None):
+    if os.path.splitext(path)[1].lower() == '.npy':
+        source = FrameStackSource(path, framerate)
+    else:
+        source = AviSource(path, framerate)
+    if len(source) == 0:
+        raise CameraBackendError(f"{path} contains no frames.")
+    return source
+
+class ReplayDataStream(SimulatedDataStream):
+    def NumBuffersAwaitDelivery(self):
+        if self.camera.realtime:
+            return super().NumBuffersAwaitDelivery()
+        return 0
+
+    def WaitForFinishedBuffer(self, timeout):
+        if self.camera.realtime:
+            return super().WaitForFinishedBuffer(timeout)
+
+        if not self.running:
+            raise RuntimeError("Acquisition is not running.")
+        if self.kill_event.is_set():
+            self.kill_event.clear()
+            raise RuntimeError("Wait for finished buffer aborted.")
+        if not self.queued_buffers:
+            if self.kill_event.wait(timeout / 1000):
+                self.kill_event.clear()
+                raise RuntimeError("Wait for finished buffer aborted.")
+            raise TimeoutError("Wait for finished buffer timed out.")
+
+        buffer = self.queued_buffers.pop(0)
+        buffer.frame_id = self.last_frame_id + 1
+        self.camera.render(buffer, None)
+        self.last_frame_id += 1
+        return buffer
+
+class ReplayCamera:
+    def __init__(self, source, realtime=True):
+        self.source = source
+        self.realtime = realtime
+        self.sensor_height, self.sensor_width = source.frame_shape
+        self.framerate = source.framerate
+        self.duration = (
+            source.timestamps[-1] - source.timestamps[0] + 1 / self.framerate)
+        self.acquisition_active = False
+        self.first_index = 0
+        self.next_index = 0
+        self.values = {
+            "Width": self.sensor_width,
+            "Height": self.sensor_height,
+            "OffsetX": 0,
+            "OffsetY": 0,
+            "ExposureTime": 1e6 / self.framerate - 10,
+            "AcquisitionFrameRate": self.framerate,
+            "GainSelector": "AnalogAll",
+            "AnalogAll": 1.0,
+            "DigitalAll": 1.0,
+            "ComponentSelector": "Raw",
+            "ComponentEnable": True,
+        }
+
+    def node_limits(self, name):
+        if name == "Width":
+            return 4, self.sensor_width - self.values["OffsetX"], 4
+        if name == "Height":
+            return 2, self.sensor_height - self.values["OffsetY"], 2
+        if name == "OffsetX":
+            return 0, self.sensor_width - self.values["Width"], 4
+        if name == "OffsetY":
+            return 0, self.sensor_height - self.values["Height"], 2
+        if name == "ExposureTime":
+            return 28.0, 1e6 / self.values["AcquisitionFrameRate"] - 10, 0
+        if name == "AcquisitionFrameRate":
+            return 1.0, self.framerate, 0
+        if name == "Gain":
+            if self.values["GainSelector"] == "AnalogAll":
+                return 1.0, 8.0, 0
+            return 1.0, 16.0, 0
+        raise KeyError(f"Node {name} does not exist.")
+
+    def get_value(self, name):
+        if name == "Gain":
+            return self.values[self.values["GainSelector"]]
+        if name == "PayloadSize":
+            return self.values["Width"] * self.values["Height"]
+        return self.values[name]
+
+    def set_value(self, name, value):
+        if name in ["GainSelector", "ComponentSelector", "ComponentEnable"]:
+            self.values[name] = value
+            return
+
+        if (
+            self.acquisition_active and
+            name in ["Width", "Height", "OffsetX", "OffsetY"]
+        ):
+            raise RuntimeError(f"Node {name} is locked during acquisition.")
+
+        minimum, maximum, increment = self.node_limits(name)
+        if not minimum <= value <= maximum:
+            raise ValueError(
+                f"Value {value} for {name} is out of range "
+                f"[{minimum}, {maximum}].")
+        if increment and (value - minimum) % increment != 0:
+            raise ValueError(
+                f"Value {value} for {name} is not a multiple of {increment}.")
+
+        if name == "Gain":
+            self.values[self.values["GainSelector"]] = value
+            return
+
+        self.values[name] = value
+        if name == "AcquisitionFrameRate":
+            self.values["ExposureTime"] = min(
+                self.values["ExposureTime"], 1e6 / value - 10)
+
+    def execute(self, name):
+        if name == "AcquisitionStart":
+            self.acquisition_active = True
+            self.first_index = self.next_index
+        elif name == "AcquisitionStop":
+            self.acquisition_active = False
+
+    def render(self, buffer, frame_time):
+        offset_x = self.values["OffsetX"]
+        offset_y = self.values["OffsetY"]
+        width = self.values["Width"]
+        height = self.values["Height"]
+
+        replay_index = self.first_index + buffer.frame_id
+        loop, index = divmod(replay_index, len(self.source))
+        image = self.source.frame(index)
+
+        frame = buffer.data[:width * height].reshape(height, width)
+        frame[:] = image[offset_y:offset_y + height, offset_x:offset_x + width]
+        buffer.width = width
+        buffer.height = height
+        buffer.frame_id = replay_index
+        buffer.timestamp_ns = int(
+            (self.source.timestamps[index] + loop * self.duration) * 1e9)
+        self.next_index = replay_index + 1
+
+class ReplayBackend(CameraBackend):
+    def __init__(self, path, realtime=True, framerate=None):
+        self.path = path
+        self.realtime = realtime
+        self.framerate = framerate
+        self.lossless = not realtime
+        self.source = None
+
+    def initialize(self):
+        pass
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def open_device(self):
+        self.close()
+        self.source = open_replay_source(self.path, self.framerate)
+        camera = ReplayCamera(self.source, self.realtime)
+        return (
+            camera,
+            SimulatedNodeMap(camera),
+            ReplayDataStream(camera),
+        )
+
+    def buffer_to_array(self, buffer):
+        return buffer.data, buffer.height, buffer.width
+
+    def buffer_metadata(self, buffer):
+        return buffer.FrameID(), buffer.Timestamp_ns()
+
+    def stop_datastream(self, datastream):
+        datastream.StopAcquisition()
+        datastream.Flush()
@@ -0,0 +1,125 @@
+import numpy as np
+
+MIN_ROI_WIDTH = 256
+MIN_ROI_HEIGHT = 2
+STEP_INCREMENT_X = 4
+STEP_INCREMENT_Y = 2
+
+def fit_axis(start, size, min_size, increment, full_size):
+    desired = max(min_size, size)
+    offset = max(0, start - (desired - size) // 2)
+    offset -= offset % increment
+    desired = max(desired, start + size - offset)
+    desired = ((desired + increment - 1) // increment) * increment
+    desired = min(desired, full_size - full_size % increment)
+    offset = min(offset, full_size - desired)
+    offset -= offset % increment
+    return offset, desired
+
+def fit_camera_roi(spots, sensor_width, sensor_height):
+    x0 = min(spot['x'] for spot in spots)
+    y0 = min(spot['y'] for spot in spots)
+    x1 = max(spot['x'] + spot['width'] for spot in spots)
+    y1 = max(spot['y'] + spot['height'] for spot in spots)
+
+    offset_x, width = fit_axis(
+        x0, x1 - x0, MIN_ROI_WIDTH, STEP_INCREMENT_X, sensor_width)
+    offset_y, height = fit_axis(
+        y0, y1 - y0, MIN_ROI_HEIGHT, STEP_INCREMENT_Y, sensor_height)
+
+    return {'x': offset_x, 'y': offset_y, 'width': width, 'height': height}
+
+class FrameRateModel:
+    def __init__(self, row_time=6.4e-6, overhead_rows=30):
+        self.row_time = row_time
+        self.overhead_rows = overhead_rows
+        self.observations = {}
+
+    def framerate(self, height):
+        return 1 / (self.row_time * (height + self.overhead_rows))
+
+    def add_observation(self, height, max_framerate):
+        if not height or not max_framerate:
+            return
+        self.observations[height] = max_framerate
+        self.fit()
+
+    def fit(self):
+        heights = np.array(list(self.observations.keys()), dtype=float)
+        periods = 1 / np.array(list(self.observations.values()), dtype=float)
+
+        if len(heights) == 1:
+            self.row_time = periods[0] / (heights[0] + self.overhead_rows)
+            return
+
+        row_time, intercept = np.polyfit(heights, periods, 1)
+        if row_time > 0 and intercept >= 0:
+            self.row_time = row_time
+            self.overhead_rows = intercept / row_time
+
+class RoiPlanner:
+    def __init__(
+            self, sensor_width, sensor_height, framerate_model,
+            switch_time=3.0, min_framerate_ratio=0.8, equal_samples=False):
+        self.sensor_width = sensor_width
+        self.sensor_height = sensor_height
+        self.framerate_model = framerate_model
+        self.switch_time = switch_time
+        self.min_framerate_ratio = min_framerate_ratio
+        self.equal_samples = equal_samples
+
+    def build_band(self, spots, duration):
+        roi = fit_camera_roi(spots, self.sensor_width, self.sensor_height)
+        band = {
+            'roi': roi,
+            'spots': list(spots),
+            'framerate': self.framerate_model.framerate(roi['height']),
+            'duration': duration,
+        }
+        if self.equal_samples:
+            single_framerate = max(
+                self.build_single_band(spot)['framerate'] for spot in spots)
+            band['duration'] = (
+                duration * single_framerate / band['framerate'])
+        return band
+
+    def build_single_band(self, spot):
+        roi = fit_camera_roi([spot], self.sensor_width, self.sensor_height)
+        return {'framerate': self.framerate_model.framerate(roi['height'])}
+
+    def plan(self, spots, duration):
+        spots = sorted(spots, key=lambda spot: (spot['y'], spot['x']))
+        single_framerates = [
+            self.build_single_band(spot)['framerate'] for spot in spots]
+
+        best_cost = [(0.0, 0.0)] + [(np.inf, 0.0)] * len(spots)
+        best_band = [None] * (len(spots) + 1)
+        for end in range(1, len(spots) + 1):
+            for start in range(end):
+                band = self.build_band(spots[start:end], duration)
+                if band['framerate'] < (
+                        self.min_framerate_ratio *
+                        max(single_framerates[start:end])):
+                    continue
+                total_time, samples = best_cost[start]
+                cost = (
+                    total_time + band['duration'] + self.switch_time,
+                    samples - band['framerate'] * band['duration'] *
+                    (end - start))
+                if cost < best_cost[end]:
+                    best_cost[end] = cost
+                    best_band[end] = (start, band)
+
+        bands = []
+        end = len(spots)
+        while end > 0:
+            start, band = best_band[end]
+            bands.insert(0, band)
+            end = start
+        return bands
+
+    def single_band_plan(self, spots, duration):
+        return [self.build_band(spots, duration)]
+
+    def estimate_scan_time(self, bands):
+        return sum(band['duration'] + self.switch_time for band in bands)
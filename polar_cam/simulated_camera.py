@@ -0,0 +1,374 @@
+import threading
+import time
+import numpy as np
+from polar_cam.camera_backend import CameraBackend
+
+POLARIZER_ANGLES = np.deg2rad(np.array([[90, 45], [135, 0]]))
+
+class SimulatedEnumEntry:
+    def __init__(self, value):
+        self.value = value
+
+    def SymbolicValue(self):
+        return self.value
+
+class SimulatedNode:
+    def __init__(self, camera, name):
+        self.camera = camera
+        self.name = name
+
+    def Value(self):
+        return self.camera.get_value(self.name)
+
+    def SetValue(self, value):
+        self.camera.set_value(self.name, value)
+
+    def Minimum(self):
+        return self.camera.node_limits(self.name)[0]
+
+    def Maximum(self):
+        return self.camera.node_limits(self.name)[1]
+
+    def Increment(self):
+        return self.camera.node_limits(self.name)[2]
+
+    def CurrentEntry(self):
+        return SimulatedEnumEntry(self.camera.get_value(self.name))
+
+    def SetCurrentEntry(self, value):
+        self.camera.set_value(self.name, value)
+
+    def Execute(self):
+        self.camera.execute(self.name)
+
+    def WaitUntilDone(self):
+        pass
+
+class SimulatedNodeMap:
+    def __init__(self, camera):
+        self.camera = camera
+        self.nodes = {}
+
+    def FindNode(self, name):
+        if name not in self.nodes:
+            self.nodes[name] = SimulatedNode(self.camera, name)
+        return self.nodes[name]
+
+class SimulatedBuffer:
+    def __init__(self, payload_size):
+        self.data = np.zeros(payload_size, dtype=np.uint8)
+        self.width = 0
+        self.height = 0
+        self.frame_id = 0
+        self.timestamp_ns = 0
+
+    def FrameID(self):
+        return self.frame_id
+
+    def Timestamp_ns(self):
+        return self.timestamp_ns
+
+class SimulatedDataStream:
+    def __init__(self, camera, min_buffers=3):
+        self.camera = camera
+        self.min_buffers = min_buffers
+        self.announced_buffers = []
+        self.queued_buffers = []
+        self.kill_event = threading.Event()
+        self.running = False
+        self.start_time = None
+        self.last_frame_id = -1
+        self.underruns = 0
+
+    def NumBuffersAnnouncedMinRequired(self):
+        return self.min_buffers
+
+    def NumBuffersAwaitDelivery(self):
+        if not self.running:
+            return 0
+        frame_period = 1 / self.camera.values["AcquisitionFrameRate"]
+        completed = int(
+            (time.perf_counter() - self.start_time) / frame_period)
+        return min(
+            max(completed - self.last_frame_id - 1, 0),
+            len(self.queued_buffers))
+
+    def NumUnderruns(self):
+        return self.underruns
+
+    def AllocAndAnnounceBuffer(self, payload_size):
+        buffer = SimulatedBuffer(payload_size)
+        self.announced_buffers.append(buffer)
+        return buffer
+
+    def AnnouncedBuffers(self):
+        return list(self.announced_buffers)
+
+    def RevokeBuffer(self, buffer):
+        if buffer in self.queued_buffers:
+            self.queued_buffers.remove(buffer)
+        self.announced_buffers.remove(buffer)
+
+    def QueueBuffer(self, buffer):
+        self.queued_buffers.append(buffer)
+
+    def StartAcquisition(self):
+        self.kill_event.clear()
+        self.running = True
+        self.start_time = time.perf_counter()
+        self.last_frame_id = -1
+
+    def StopAcquisition(self, *args):
+        self.running = False
+
+    def Flush(self, *args):
+        self.queued_buffers.clear()
+
+    def KillWait(self):
+        self.kill_event.set()
+
+    def WaitForFinishedBuffer(self, timeout):
+        if not self.running:
+            raise RuntimeError("Acquisition is not running.")
+
+        framerate = self.camera.values["AcquisitionFrameRate"]
+        frame_period = 1 / framerate
+        frame_id = self.last_frame_id + 1
+        completed = int(
+            (time.perf_counter() - self.start_time) / frame_period)
+        backlog = max(len(self.queued_buffers), 1)
+        if completed - frame_id >= backlog:
+            self.underruns += completed - backlog + 1 - frame_id
+            frame_id = completed - backlog + 1
+
+        due = self.start_time + (frame_id + 1) * frame_period
+        wait = due - time.perf_counter()
+        if not self.queued_buffers or wait > timeout / 1000:
+            if self.kill_event.wait(timeout / 1000):
+                self.kill_event.clear()
+                raise RuntimeError("Wait for finished buffer aborted.")
+            raise TimeoutError("Wait for finished buffer timed out.")
+
+        if wait > 0 and self.kill_event.wait(wait):
+            self.kill_event.clear()
+            raise RuntimeError("Wait for finished buffer aborted.")
+
+        buffer = self.queued_buffers.pop(0)
+        frame_time = self.start_time + frame_id * frame_period
+        buffer.frame_id = frame_id
+        buffer.timestamp_ns = int(frame_time * 1e9)
+        self.camera.render(buffer, frame_time)
+        self.last_frame_id = frame_id
+        return buffer
+
+class SimulatedCamera:
+    def __init__(
+            self, sensor_width=2464, sensor_height=2056, framerate=30.0,
+            noise=2.0, spot_count=10, spot_sigma=4.0, brightness=200.0,
+            background=5.0, modulation=0.8, rotation_range=(5.0, 100.0),
+            seed=None):
+        self.sensor_width = sensor_width
+        self.sensor_height = sensor_height
+        self.noise = noise
+        self.brightness = brightness
+        self.background = background
+        self.modulation = modulation
+        self.row_time_us = 6.4
+        self.overhead_rows = 30
+        self.reference_exposure_us = 1000.0
+        self.acquisition_active = False
+        self.rng = np.random.default_rng(seed)
+        self.values = {
+            "Width": sensor_width,
+            "Height": sensor_height,
+            "OffsetX": 0,
+            "OffsetY": 0,
+            "ExposureTime": 10000.0,
+            "AcquisitionFrameRate": 1.0,
+            "GainSelector": "AnalogAll",
+            "AnalogAll": 1.0,
+            "DigitalAll": 1.0,
+            "ComponentSelector": "Raw",
+            "ComponentEnable": True,
+        }
+        self.values["AcquisitionFrameRate"] = min(
+            framerate, self.node_limits("AcquisitionFrameRate")[1])
+        self.spots = self.generate_spots(
+            spot_count, spot_sigma, rotation_range)
+        self.patch_cache_key = None
+        self.patch_cache = []
+        self.noise_bank = None
+        self.noise_rows = 64
+
+    def generate_spots(self, spot_count, spot_sigma, rotation_range):
+        margin = int(4 * spot_sigma) + 2
+        spots = []
+        for _ in range(spot_count):
+            spots.append({
+                'x': self.rng.uniform(margin, self.sensor_width - margin),
+                'y': self.rng.uniform(margin, self.sensor_height - margin),
+                'sigma': spot_sigma,
+                'amplitude': self.rng.uniform(0.6, 1.0),
+                'frequency': (
+                    self.rng.uniform(*rotation_range) *
+                    self.rng.choice([-1, 1])),
+                'phase': self.rng.uniform(0, 2 * np.pi),
+            })
+        return spots
+
+    def max_framerate(self):
+        readout_us = (
+            (self.values["Height"] + self.overhead_rows) * self.row_time_us)
+        return 1e6 / max(readout_us, self.values["ExposureTime"] + 10)
+
+    def node_limits(self, name):
+        if name == "Width":
+            return 256, self.sensor_width - self.values["OffsetX"], 4
+        if name == "Height":
+            return 2, self.sensor_height - self.values["OffsetY"], 2
+        if name == "OffsetX":
+            return 0, self.sensor_width - self.values["Width"], 4
+        if name == "OffsetY":
+            return 0, self.sensor_height - self.values["Height"], 2
+        if name == "ExposureTime":
+            framerate = self.values["AcquisitionFrameRate"]
+            return 28.0, 1e6 / framerate - 10, 0
+        if name == "AcquisitionFrameRate":
+            return 1.0, self.max_framerate(), 0
+        if name == "Gain":
+            if self.values["GainSelector"] == "AnalogAll":
+                return 1.0, 8.0, 0
+            return 1.0, 16.0, 0
+        raise KeyError(f"Node {name} does not exist.")
+
+    def get_value(self, name):
+        if name == "Gain":
+            return self.values[self.values["GainSelector"]]
+        if name == "PayloadSize":
+            return self.values["Width"] * self.values["Height"]
+        return self.values[name]
+
+    def set_value(self, name, value):
+        if name in ["GainSelector", "ComponentSelector", "ComponentEnable"]:
+            self.values[name] = value
+            return
+
+        if (
+            self.acquisition_active and
+            name in ["Width", "Height", "OffsetX", "OffsetY"]
+        ):
+            raise RuntimeError(f"Node {name} is locked during acquisition.")
+
+        minimum, maximum, increment = self.node_limits(name)
+        if not minimum <= value <= maximum:
+            raise ValueError(
+                f"Value {value} for {name} is out of range "
+                f"[{minimum}, {maximum}].")
+        if increment and (value - minimum) % increment != 0:
+            raise ValueError(
+                f"Value {value} for {name} is not a multiple of {increment}.")
+
+        if name == "Gain":
+            self.values[self.values["GainSelector"]] = value
+            return
+
+        self.values[name] = value
+        if name in ["Height", "ExposureTime"]:
+            self.values["AcquisitionFrameRate"] = min(
+                self.values["AcquisitionFrameRate"], self.max_framerate())
+
+    def execute(self, name):
+        if name == "AcquisitionStart":
+            self.acquisition_active = True
+        elif name == "AcquisitionStop":
+            self.acquisition_active = False
+
+    def build_patches(self, offset_x, offset_y, width, height):
+        patches = []
+        for spot in self.spots:
+            reach = int(4 * spot['sigma']) + 1
+            x0 = max(int(spot['x']) - reach, offset_x)
+            x1 = min(int(spot['x']) + reach + 1, offset_x + width)
+            y0 = max(int(spot['y']) - reach, offset_y)
+            y1 = min(int(spot['y']) + reach + 1, offset_y + height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+
+            rows, cols = np.mgrid[y0:y1, x0:x1]
+            profile = spot['amplitude'] * np.exp(
+                -((cols - spot['x']) ** 2 + (rows - spot['y']) ** 2) /
+                (2 * spot['sigma'] ** 2))
+            angles = POLARIZER_ANGLES[rows % 2, cols % 2]
+            patches.append((
+                spot,
+                slice(y0 - offset_y, y1 - offset_y),
+                slice(x0 - offset_x, x1 - offset_x),
+                profile * np.cos(2 * angles),
+                profile * np.sin(2 * angles),
+                profile,
+            ))
+        return patches
+
+    def render(self, buffer, frame_time):
+        offset_x = self.values["OffsetX"]
+        offset_y = self.values["OffsetY"]
+        width = self.values["Width"]
+        height = self.values["Height"]
+
+        key = (offset_x, offset_y, width, height)
+        if key != self.patch_cache_key:
+            self.patch_cache = self.build_patches(*key)
+            self.patch_cache_key = key
+            self.noise_bank = self.rng.normal(
+                self.background, self.noise,
+                (height + self.noise_rows, width)).astype(np.float32)
+
+        gain = (
+            self.values["AnalogAll"] * self.values["DigitalAll"] *
+            self.values["ExposureTime"] / self.reference_exposure_us)
+        scale = 0.5 * self.brightness * gain
+
+        start_row = self.rng.integers(self.noise_rows)
+        image = self.noise_bank[start_row:start_row + height].copy()
+
+        for spot, rows, cols, cos_map, sin_map, profile in self.patch_cache:
+            theta = 2 * (
+                2 * np.pi * spot['frequency'] * frame_time + spot['phase'])
+            image[rows, cols] += scale * (
+                profile + self.modulation * (
+                    np.cos(theta) * cos_map + np.sin(theta) * sin_map))
+
+        frame = buffer.data[:width * height].reshape(height, width)
+        np.clip(image, 0, 255, out=image)
+        np.copyto(frame, image, casting='unsafe')
+        buffer.width = width
+        buffer.height = height
+
+class SimulatedBackend(CameraBackend):
+    def __init__(self, **camera_options):
+        self.camera_options = camera_options
+        self.camera = None
+
+    def initialize(self):
+        pass
+
+    def close(self):
+        pass
+
+    def open_device(self):
+        self.camera = SimulatedCamera(**self.camera_options)
+        return (
+            self.camera,
+            SimulatedNodeMap(self.camera),
+            SimulatedDataStream(self.camera),
+        )
+
+    def buffer_to_array(self, buffer):
+        return buffer.data, buffer.height, buffer.width
+
+    def buffer_metadata(self, buffer):
+        return buffer.FrameID(), buffer.Timestamp_ns()
+
+    def stop_datastream(self, datastream):
+        datastream.StopAcquisition()
+        datastream.Flush()
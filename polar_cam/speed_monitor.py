@@ -0,0 +1,87 @@
+from collections import deque
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+from polar_cam.data_analyzer import SIGNAL_LABELS
+from polar_cam.image_processor import POLAR_CHANNELS
+
+class SpeedMonitor(QObject):
+    speed_updated = Signal(dict)
+
+    def __init__(self, data_analyzer, threshold=1, history=600):
+        super().__init__()
+        self.data_analyzer = data_analyzer
+        self.threshold = threshold
+        self.history = history
+        self.windowsize = data_analyzer.windowsize
+        self.hop = data_analyzer.overlap
+        self.traces = {}
+        self.start_band([])
+
+    def reset(self):
+        self.traces = {}
+        self.start_band([])
+
+    def start_band(self, spot_ids):
+        self.spot_ids = list(spot_ids)
+        self.samples = np.zeros(
+            (len(self.spot_ids), 2 * self.windowsize, len(POLAR_CHANNELS)))
+        self.times = np.zeros(2 * self.windowsize)
+        self.position = 0
+        self.filled = 0
+        self.since_update = 0
+        for spot_id in self.spot_ids:
+            self.traces.setdefault(spot_id, {
+                label: deque(maxlen=self.history) for label in SIGNAL_LABELS
+            })
+
+    def append(self, timestamp, intensities):
+        position = self.position
+        self.samples[:, position] = intensities
+        self.samples[:, position + self.windowsize] = intensities
+        self.times[position] = timestamp
+        self.times[position + self.windowsize] = timestamp
+        self.position = (position + 1) % self.windowsize
+        self.filled = min(self.filled + 1, self.windowsize)
+        self.since_update += 1
+
+        if self.filled == self.windowsize and self.since_update >= self.hop:
+            self.since_update = 0
+            self.update()
+
+    def update(self):
+        window = slice(self.position, self.position + self.windowsize)
+        times = self.times[window]
+        fs = (self.windowsize - 1) / (times[-1] - times[0])
+        if not np.isfinite(fs) or fs <= 0:
+            return
+
+        samples = self.samples[:, window]
+        center = (times[0] + times[-1]) / 2
+
+        speeds = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            signals = self.data_analyzer.polar_signals({
+                channel: samples[..., index]
+                for index, channel in enumerate(POLAR_CHANNELS)
+            })
+            for label in SIGNAL_LABELS:
+                dominant, power = self.data_analyzer.welch_peaks(
+                    signals[label], fs)
+                dominant = np.where(power >= self.threshold, dominant, np.nan)
+                speeds[label] = {}
+                for spot_id, frequency in zip(self.spot_ids, dominant):
+                    self.traces[spot_id][label].append((center, frequency))
+                    speeds[label][spot_id] = float(frequency)
+
+        self.speed_updated.emit({
+            'time': center,
+            'spot_ids': self.spot_ids,
+            'speeds': speeds,
+        })
+
+    def trace(self, spot_id, label):
+        points = self.traces.get(spot_id, {}).get(label)
+        if not points:
+            return np.empty(0), np.empty(0)
+        times, frequencies = np.array(points).T
+        return times, frequencies
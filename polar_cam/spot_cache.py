@@ -0,0 +1,94 @@
+import json
+import os
+import time
+import numpy as np
+
+class SpotSettingsCache:
+    def __init__(
+            self, path, position_tolerance=4, intensity_tolerance=0.2,
+            max_age=3600):
+        self.path = path
+        self.position_tolerance = position_tolerance
+        self.intensity_tolerance = intensity_tolerance
+        self.max_age = max_age
+        self.entries = []
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Could not load spot settings cache: {e}")
+            self.entries = []
+
+    def save(self):
+        try:
+            with open(self.path, 'w') as file:
+                json.dump(self.entries, file, indent=2)
+        except OSError as e:
+            print(f"Could not save spot settings cache: {e}")
+
+    def spot_center(self, spot):
+        return (
+            spot['x'] + spot['width'] / 2, spot['y'] + spot['height'] / 2)
+
+    def find(self, spot):
+        center_x, center_y = self.spot_center(spot)
+        best_entry = None
+        best_distance = self.position_tolerance
+        for entry in self.entries:
+            entry_x, entry_y = self.spot_center(entry['spot'])
+            distance = np.hypot(entry_x - center_x, entry_y - center_y)
+            if distance <= best_distance:
+                best_entry = entry
+                best_distance = distance
+        return best_entry
+
+    def lookup(self, spot):
+        entry = self.find(spot)
+        if entry is None or time.time() - entry['timestamp'] > self.max_age:
+            return None
+        return entry
+
+    def lookup_band(self, band):
+        entries = [self.lookup(spot) for spot in band['spots']]
+        if not entries or any(entry is None for entry in entries):
+            return None
+
+        settings = {
+            (entry['analog_gain'], entry['digital_gain'], entry['exposure'])
+            for entry in entries
+        }
+        if len(settings) != 1:
+            return None
+
+        analog_gain, digital_gain, exposure = settings.pop()
+        return {
+            'analog_gain': analog_gain,
+            'digital_gain': digital_gain,
+            'exposure': exposure,
+            'max_pixel_value': max(
+                entry['max_pixel_value'] for entry in entries),
+        }
+
+    def store_band(self, band, parameters, max_pixel_value):
+        for spot in band['spots']:
+            entry = self.find(spot)
+            if entry is not None:
+                self.entries.remove(entry)
+            self.entries.append({
+                'spot': {
+                    'x': spot['x'], 'y': spot['y'],
+                    'width': spot['width'], 'height': spot['height']
+                },
+                'roi': band['roi'],
+                'analog_gain': parameters["AnalogGain"]["current"],
+                'digital_gain': parameters["DigitalGain"]["current"],
+                'exposure': parameters["ExposureTime"]["current"],
+                'max_pixel_value': int(max_pixel_value),
+                'timestamp': time.time(),
+            })
+        self.save()
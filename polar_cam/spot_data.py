@@ -0,0 +1,268 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+from polar_cam.image_processor import POLAR_CHANNELS
+
+SPOT_COLUMNS = {
+    'timestamps': '<f8',
+    'frame_ids': '<i8',
+    '90': '<f4',
+    '45': '<f4',
+    '135': '<f4',
+    '0': '<f4',
+}
+NPY_HEADER_SIZE = 128
+SPOT_DATA_VERSION = 1
+
+def npy_header(dtype, shape):
+    header = (
+        "{'descr': %r, 'fortran_order': False, 'shape': %s, }"
+        % (np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape))
+    )
+    header = header.ljust(NPY_HEADER_SIZE - 11) + '\n'
+    return (
+        b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') +
+        header.encode('latin1')
+    )
+
+def spot_data_directory(folder, spot_id):
+    return os.path.join(folder, f"spot_{spot_id}_data")
+
+def load_spot_columns(directory, mmap_mode='r'):
+    columns = {
+        name: np.load(
+            os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in SPOT_COLUMNS
+    }
+    rows = min(len(column) for column in columns.values())
+    return {name: column[:rows] for name, column in columns.items()}
+
+def load_spot_metadata(directory):
+    path = os.path.join(directory, 'metadata.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def load_spot_data(directory, mmap_mode='r'):
+    metadata = load_spot_metadata(directory)
+    version = metadata.get('format_version', SPOT_DATA_VERSION)
+    if version > SPOT_DATA_VERSION:
+        raise ValueError(
+            f"Unsupported spot data format version {version} in {directory}.")
+    return load_spot_columns(directory, mmap_mode), metadata
+
+def write_spot_metadata(directory, metadata):
+    metadata = dict(format_version=SPOT_DATA_VERSION, **metadata)
+    with open(os.path.join(directory, 'metadata.json'), 'w') as file:
+        json.dump(metadata, file, indent=2)
+
+def write_spot_data(directory, columns, metadata):
+    os.makedirs(directory, exist_ok=True)
+    for name, dtype in SPOT_COLUMNS.items():
+        np.save(
+            os.path.join(directory, f"{name}.npy"),
+            np.asarray(columns[name], dtype=dtype))
+    write_spot_metadata(directory, metadata)
+
+def convert_npz_spot_data(npz_path):
+    data = np.load(npz_path, allow_pickle=True)
+    intensities = data['intensities'].item()
+    timestamps = data['timestamps']
+
+    columns = {
+        'timestamps': timestamps,
+        'frame_ids': (
+            data['frame_ids'] if 'frame_ids' in data.files
+            else np.full(len(timestamps), -1)),
+    }
+    columns.update(
+        {channel: intensities[channel] for channel in POLAR_CHANNELS})
+
+    metadata = {'converted_from': os.path.basename(npz_path)}
+    if 'visits' in data.files:
+        metadata['visits'] = data['visits'].tolist()
+    for key in ['dropped_frames', 'frame_gaps']:
+        if key in data.files:
+            metadata[key] = int(data[key])
+
+    directory = os.path.splitext(npz_path)[0]
+    write_spot_data(directory, columns, metadata)
+    return directory
+
+def convert_sample_folder(folder):
+    converted = []
+    for file in sorted(os.listdir(folder)):
+        path = os.path.join(folder, file)
+        if (
+            file.startswith('spot_') and file.endswith('_data.npz') and
+            not os.path.isdir(os.path.splitext(path)[0])
+        ):
+            converted.append(convert_npz_spot_data(path))
+    return converted
+
+class ColumnFile:
+    def __init__(self, path, dtype):
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.file = open(path, 'w+b')
+        self.file.write(npy_header(self.dtype, (0,)))
+
+    def append(self, values):
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(np.ascontiguousarray(values, dtype=self.dtype).data)
+        self.rows += len(values)
+
+    def flush(self):
+        self.file.seek(0)
+        self.file.write(npy_header(self.dtype, (self.rows,)))
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class SpotRecorder(QObject):
+    failed = Signal(str)
+
+    def __init__(self, folder, chunk_size=4096, flush_interval=1.0):
+        super().__init__()
+        self.folder = folder
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.committed_rows = {}
+        self.spot_ids = []
+        self.fill = 0
+        self.last_submit_time = time.perf_counter()
+        self.chunk_counter = 0
+        self.last_error = None
+        self.write_queue = queue.Queue()
+        self.writer = threading.Thread(target=self.run, daemon=True)
+        self.writer.start()
+        self.allocate_chunk()
+
+    def allocate_chunk(self):
+        self.timestamps = np.empty(self.chunk_size, dtype=np.float64)
+        self.frame_ids = np.empty(self.chunk_size, dtype=np.int64)
+        self.intensities = np.empty(
+            (self.chunk_size, len(self.spot_ids), len(POLAR_CHANNELS)),
+            dtype=np.float32)
+
+    def start_band(self, spot_ids):
+        self.submit()
+        self.spot_ids = list(spot_ids)
+        for spot_id in self.spot_ids:
+            self.committed_rows.setdefault(spot_id, 0)
+        self.allocate_chunk()
+
+    def append(self, timestamp, frame_id, intensities):
+        self.timestamps[self.fill] = timestamp
+        self.frame_ids[self.fill] = frame_id
+        self.intensities[self.fill] = intensities
+        self.fill += 1
+
+        if (
+            self.fill == self.chunk_size or
+            time.perf_counter() - self.last_submit_time >= self.flush_interval
+        ):
+            self.submit()
+
+    def submit(self):
+        self.last_submit_time = time.perf_counter()
+        if self.fill == 0:
+            return
+
+        self.write_queue.put((
+            'chunk', self.spot_ids, self.timestamps[:self.fill],
+            self.frame_ids[:self.fill], self.intensities[:self.fill]))
+        for spot_id in self.spot_ids:
+            self.committed_rows[spot_id] += self.fill
+        self.fill = 0
+        self.chunk_counter += 1
+        self.allocate_chunk()
+
+    def row_count(self, spot_id):
+        rows = self.committed_rows.get(spot_id, 0)
+        if spot_id in self.spot_ids:
+            rows += self.fill
+        return rows
+
+    def finish_spot(self, spot_id, metadata):
+        self.submit()
+        self.write_queue.put(('metadata', spot_id, metadata))
+
+    def pending_chunks(self):
+        return self.write_queue.qsize()
+
+    def close(self):
+        self.submit()
+        self.write_queue.put(None)
+        self.writer.join()
+
+    def run(self):
+        files = {}
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            if self.last_error is not None:
+                continue
+
+            try:
+                if item[0] == 'chunk':
+                    self.write_chunk(files, *item[1:])
+                else:
+                    self.write_metadata(files, *item[1:])
+            except (OSError, ValueError) as e:
+                self.last_error = f"Error writing spot data: {e}"
+                self.failed.emit(self.last_error)
+
+        for columns in files.values():
+            for column_file in columns.values():
+                column_file.close()
+
+    def column_files(self, files, spot_id):
+        if spot_id not in files:
+            directory = spot_data_directory(self.folder, spot_id)
+            os.makedirs(directory, exist_ok=True)
+            files[spot_id] = {
+                name: ColumnFile(os.path.join(directory, f"{name}.npy"), dtype)
+                for name, dtype in SPOT_COLUMNS.items()
+            }
+        return files[spot_id]
+
+    def write_chunk(self, files, spot_ids, timestamps, frame_ids, intensities):
+        for index, spot_id in enumerate(spot_ids):
+            columns = self.column_files(files, spot_id)
+            columns['timestamps'].append(timestamps)
+            columns['frame_ids'].append(frame_ids)
+            for channel_index, channel in enumerate(POLAR_CHANNELS):
+                columns[channel].append(intensities[:, index, channel_index])
+            for column_file in columns.values():
+                column_file.flush()
+
+    def write_metadata(self, files, spot_id, metadata):
+        self.column_files(files, spot_id)
+        for column_file in files.pop(spot_id).values():
+            column_file.close()
+
+        write_spot_metadata(
+            spot_data_directory(self.folder, spot_id), metadata)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: polarcam-convert FOLDER [FOLDER ...]")
+        return
+
+    for folder in sys.argv[1:]:
+        for root, _, _ in os.walk(folder):
+            for directory in convert_sample_folder(root):
+                print(f"Converted {directory}")
+
+if __name__ == "__main__":
+    main()
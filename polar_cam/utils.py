@@ -1,5 +1,12 @@
 import numpy as np
 
+NODE_NAMES = [
+    "AcquisitionFrameRate", "ExposureTime", "Width", "Height", "OffsetX",
+    "OffsetY", "GainSelector", "Gain", "PayloadSize", "AcquisitionStart",
+    "AcquisitionStop", "ComponentSelector", "ComponentEnable"
+]
+GAIN_SELECTORS = {"AnalogGain": "AnalogAll", "DigitalGain": "DigitalAll"}
+
 def adjust_rectangle(x, y, w, h):
     if x % 2 != 0: x += 1
     if y % 2 != 0: y += 1
@@ -46,6 +53,27 @@ def calculate_image_rect(
 
     return image_pos_x, image_pos_y, int(image_width), int(image_height)
 
+class CachedNodeMap:
+    def __init__(self, node_map, node_names=NODE_NAMES):
+        self.node_map = node_map
+        self.nodes = {}
+        self.gain_selector = None
+        for name in node_names:
+            self.FindNode(name)
+
+    def FindNode(self, name):
+        node = self.nodes.get(name)
+        if node is None:
+            node = self.node_map.FindNode(name)
+            self.nodes[name] = node
+        return node
+
+    def select_gain(self, gain_type):
+        selector = GAIN_SELECTORS[gain_type]
+        if self.gain_selector != selector:
+            self.FindNode("GainSelector").SetCurrentEntry(selector)
+            self.gain_selector = selector
+
 def configure_device_component(node_map_remote_device, camera_error):
     component_selector = (
         node_map_remote_device.FindNode("ComponentSelector")
@@ -61,28 +89,38 @@ def configure_device_component(node_map_remote_device, camera_error):
         except Exception as e:
             camera_error.emit(f"Warning: Error Setting Component: {e}")
 
-def fetch_camera_parameters(node_map_remote_device, parameters, camera_error):
+def fetch_camera_parameters(
+        node_map_remote_device, parameters, camera_error, names=None,
+        limit_names=None):
     try:
         param_names = [
             "AcquisitionFrameRate", "ExposureTime", "Width",
             "Height", "OffsetX", "OffsetY"
         ]
         for param in param_names:
+            if names is not None and param not in names:
+                continue
             node = node_map_remote_device.FindNode(param)
-            parameters[param]["min"] = node.Minimum()
-            parameters[param]["max"] = node.Maximum()
+            if limit_names is None or param in limit_names:
+                parameters[param]["min"] = node.Minimum()
+                parameters[param]["max"] = node.Maximum()
+                if param in ["Width", "Height", "OffsetX", "OffsetY"]:
+                    parameters[param]["increment"] = node.Increment()
             parameters[param]["current"] = node.Value()
-            if param in ["Width", "Height", "OffsetX", "OffsetY"]:
-                parameters[param]["increment"] = node.Increment()
 
-        gain_types = ["AnalogGain", "DigitalGain"]
+        gain_types = sorted(
+            GAIN_SELECTORS,
+            key=lambda gain: (
+                GAIN_SELECTORS[gain] != node_map_remote_device.gain_selector)
+        )
         for gain in gain_types:
-            gain_sel = "AnalogAll" if gain == "AnalogGain" else "DigitalAll"
-            node_map_remote_device.FindNode("GainSelector")\
-                .SetCurrentEntry(gain_sel)
+            if names is not None and gain not in names:
+                continue
+            node_map_remote_device.select_gain(gain)
             gain_node = node_map_remote_device.FindNode("Gain")
-            parameters[gain]["min"] = gain_node.Minimum()
-            parameters[gain]["max"] = gain_node.Maximum()
+            if limit_names is None or gain in limit_names:
+                parameters[gain]["min"] = gain_node.Minimum()
+                parameters[gain]["max"] = gain_node.Maximum()
             parameters[gain]["current"] = gain_node.Value()
 
         return parameters
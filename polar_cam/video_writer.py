@@ -0,0 +1,97 @@
+import queue
+import time
+import cv2
+import numpy as np
+from PySide6.QtCore import QThread, Signal
+
+class AviFrameSink:
+    def __init__(self, path, framerate):
+        self.path = path
+        self.framerate = framerate
+        self.video = None
+
+    def write(self, frame, frame_id, timestamp):
+        if self.video is None:
+            height, width = frame.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*'XVID')
+            self.video = cv2.VideoWriter(
+                self.path, fourcc, self.framerate, (width, height),
+                isColor=False)
+        self.video.write(np.ascontiguousarray(frame))
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+
+class VideoWriter(QThread):
+    failed = Signal(str)
+
+    def __init__(self, sink, queue_size=64):
+        super().__init__()
+        self.sink = sink
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.closing = False
+        self.written_counter = 0
+        self.dropped_counter = 0
+        self.error_counter = 0
+        self.max_queue_depth = 0
+        self.write_time_total = 0.0
+        self.last_error = None
+
+    def submit(self, frame, frame_id, timestamp):
+        if self.closing:
+            return False
+        try:
+            self.frame_queue.put_nowait((frame, frame_id, timestamp))
+        except queue.Full:
+            self.dropped_counter += 1
+            return False
+        self.max_queue_depth = max(
+            self.max_queue_depth, self.frame_queue.qsize())
+        return True
+
+    def close(self):
+        self.closing = True
+
+    def statistics(self):
+        return {
+            'written': self.written_counter,
+            'dropped': self.dropped_counter,
+            'errors': self.error_counter,
+            'last_error': self.last_error,
+            'queued': self.frame_queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'mean_write_ms': (
+                1000 * self.write_time_total / self.written_counter
+                if self.written_counter else 0.0),
+        }
+
+    def run(self):
+        while True:
+            try:
+                frame, frame_id, timestamp = self.frame_queue.get(
+                    timeout=0.1)
+            except queue.Empty:
+                if self.closing:
+                    break
+                continue
+
+            if self.last_error is not None:
+                self.dropped_counter += 1
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                self.sink.write(frame, frame_id, timestamp)
+                self.written_counter += 1
+            except (OSError, ValueError, cv2.error) as e:
+                self.error_counter += 1
+                self.last_error = f"Error writing frame {frame_id}: {e}"
+                self.closing = True
+                self.failed.emit(self.last_error)
+            self.write_time_total += time.perf_counter() - start_time
+
+        try:
+            self.sink.close()
+        except (OSError, cv2.error) as e:
+            print(f"Error closing recording: {e}")
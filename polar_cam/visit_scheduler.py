@@ -0,0 +1,71 @@
+import time
+
+def reconfiguration_cost(roi_a, roi_b):
+    if roi_a == roi_b:
+        return 0
+    return 1 + sum(
+        abs(roi_a[key] - roi_b[key]) for key in ['x', 'y', 'width', 'height'])
+
+class VisitScheduler:
+    def __init__(self, bands, rounds=1):
+        self.bands = self.order_bands(bands)
+        self.rounds = rounds
+        self.visits = self.build_visits()
+        self.start_time = None
+        self.recorded_time = 0.0
+
+    def order_bands(self, bands):
+        remaining = sorted(
+            bands, key=lambda band: (band['roi']['y'], band['roi']['x']))
+        if not remaining:
+            return []
+
+        ordered = [remaining.pop(0)]
+        while remaining:
+            nearest = min(
+                remaining,
+                key=lambda band: reconfiguration_cost(
+                    ordered[-1]['roi'], band['roi'])
+            )
+            remaining.remove(nearest)
+            ordered.append(nearest)
+        return ordered
+
+    def build_visits(self):
+        visits = []
+        for round_index in range(self.rounds):
+            bands = self.bands if round_index % 2 == 0 else self.bands[::-1]
+            for band in bands:
+                visits.append({
+                    'band': band,
+                    'round': round_index,
+                    'final': False,
+                    'reconfigure': (
+                        not visits or visits[-1]['band'] is not band),
+                })
+
+        finished_bands = []
+        for visit in reversed(visits):
+            if not any(visit['band'] is band for band in finished_bands):
+                visit['final'] = True
+                finished_bands.append(visit['band'])
+        return visits
+
+    def switch_count(self):
+        return sum(visit['reconfigure'] for visit in self.visits)
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.recorded_time = 0.0
+
+    def add_recorded_time(self, seconds):
+        self.recorded_time += seconds
+
+    def wall_time(self):
+        if self.start_time is None:
+            return 0.0
+        return time.perf_counter() - self.start_time
+
+    def duty_cycle(self):
+        wall_time = self.wall_time()
+        return self.recorded_time / wall_time if wall_time > 0 else 0.0
@@ -18,6 +18,7 @@ setup(
     entry_points={
         'console_scripts': [
             'polarcam = polar_cam.main:main',
+            'polarcam-convert = polar_cam.spot_data:main',
         ],
     },
 )
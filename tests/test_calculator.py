@@ -1,6 +1,8 @@
+import os
 import tkinter as tk
 from tkinter import filedialog
 import numpy as np
+from polar_cam.spot_data import load_spot_data
 
 def parse_file(file_path):
     timestamps = []
@@ -23,6 +25,13 @@ def parse_file(file_path):
     
     return timestamps, c90_values, c45_values, c135_values, c0_values
 
+def parse_spot_data(directory):
+    columns, _ = load_spot_data(directory)
+    return (
+        columns['timestamps'], columns['90'], columns['45'],
+        columns['135'], columns['0']
+    )
+
 def parse_npz_file(file_path):
     data = np.load(file_path, allow_pickle=True)
     timestamps = data['timestamps']
@@ -79,10 +88,16 @@ def select_and_calculate(file_path=None):
         file_path = filedialog.askopenfilename(
             title="Select a file",
             filetypes=(("Text files", "*.txt"),
+                        ("Spot data", "metadata.json"),
                         ("NPZ files", "*.npz"), ("All files", "*.*"))
         )
     if file_path:
-        if file_path.endswith('.txt'):
+        if file_path.endswith('metadata.json'):
+            file_path = os.path.dirname(file_path)
+
+        if os.path.isdir(file_path):
+            timestamps, c90, c45, c135, c0 = parse_spot_data(file_path)
+        elif file_path.endswith('.txt'):
             timestamps, c90, c45, c135, c0 = parse_file(file_path)
         elif file_path.endswith('.npz'):
             timestamps, c90, c45, c135, c0 = parse_npz_file(file_path)
@@ -11,10 +11,10 @@ def select_folder():
     return folder_path
 
 def process_files_in_folder(folder_path):
-    for root, _, files in os.walk(folder_path):
-        for file in files:
+    for root, directories, files in os.walk(folder_path):
+        for file in directories + files:
             if (
-                (file.startswith('spot_') and file.endswith('_data.npz')) or
+                (file.startswith('spot_') and file.endswith('_data')) or
                 (file.startswith('raw_data_spot_') and file.endswith('.txt'))
             ):
                 file_path = os.path.join(root, file)